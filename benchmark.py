@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import types
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Reproducible benchmarks for data generation, loading and the per-tab render
+# paths of the dashboard.
+#
+# A scale N means N patients for the roster stages (generation, ensure_data_exists,
+# decoding the nested fields) and N records in one patient's tables for the
+# per-patient stages (N vital sign readings, reports and comments, and the
+# condition timeline tiled to N events), so every stage grows with the scale
+# without generating N full patient bundles. Render paths are timed cold
+# (data cache cleared: parse and index) and warm (a rerun on cached data).
+#
+# Everything runs in a scratch directory with Streamlit replaced by a no-op
+# stub, so the suite runs headless and never touches the real data directory.
+# Results are written as JSON; given a baseline file, stages that got slower
+# than the threshold are reported and the exit status is 1.
+
+SCALES = [20, 1000, 10000, 100000]
+REPEAT = 5
+SEED = 42
+
+# Allowed slowdown against the baseline (0.25 = 25% slower)
+THRESHOLD = 0.25
+
+# Stages faster than this in both runs are never reported (timer noise)
+MIN_SECONDS = 0.005
+
+# History and chart settings used for the vitals stages
+VITALS_DAYS = 30
+CHART_WIDTH = 700
+DOWNSAMPLING = 'minmax'
+
+
+# Stand-in for every streamlit attribute: callable (returning itself, or the
+# function when used as a bare decorator), a context manager and an empty iterable
+class _Noop:
+    def __call__(self, *args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+# Replace the streamlit module before any dashboard module imports it
+def stub_streamlit():
+    stub = types.ModuleType('streamlit')
+    stub.__getattr__ = lambda name: _Noop()
+    sys.modules['streamlit'] = stub
+    return stub
+
+
+# Median and best wall time of fn() over `repeat` runs (setup() runs untimed before each)
+def measure(fn, repeat=REPEAT, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'runs': repeat}
+
+
+# Stages of one scale as (name, fn, setup). The dashboard modules are imported
+# here, once run_benchmarks has moved to the scratch directory and stubbed streamlit.
+def build_stages(scale, seed):
+    import data_gen, data_store, st_app, patient_index, vitals_store, vitals_rollups, downsample, vitals_gen
+    import reports_store, facets, condition_timeline, figure_cache, html_blocks
+    state = {}
+
+    # Roster
+    def generate_roster():
+        state['patients'] = data_gen.generate_patient_data(scale, random.Random(seed))
+
+    def decode_rows():
+        state['rows'] = data_store.read_table('patients').to_dict('records')
+
+    def process_rows():
+        for row in state['rows']:
+            patient_index.process_patient_data(dict(row))
+
+    def load_index():
+        patients = patient_index.load_patient_index()
+        patients.get(patients.ids[0])
+
+    # Per-patient generators, sized to the scale
+    def patient():
+        return state['patients'][0]
+
+    def generate_vitals():
+        interval = VITALS_DAYS * 24 * 60 / scale
+        vitals_gen.generate_vital_signs(patient()['id'], days=VITALS_DAYS, interval_minutes=interval,
+                                        rng=np.random.default_rng(seed))
+
+    def generate_reports():
+        data_gen.generate_medical_reports(patient()['id'], patient(), num_reports=scale, rng=random.Random(seed))
+
+    def generate_comments():
+        data_gen.generate_comments(patient()['id'], num_comments=scale, rng=random.Random(seed))
+
+    def generate_timeline():
+        data_gen.generate_conditions_timeline(patient()['id'], patient(), rng=random.Random(seed))
+
+    # The generator's event count is fixed per condition, so the table is tiled to the scale
+    def tile_timeline():
+        pid = patient()['id']
+        events = data_store.read_table('condition_timeline', pid)
+        if events.empty:
+            return
+        tiled = events.sample(n=scale, replace=True, random_state=seed).sort_values('date', kind='stable')
+        data_store.save_table(tiled.reset_index(drop=True), 'condition_timeline', pid)
+
+    # Vitals: window slice, resolution and rollups as in display_live_monitoring
+    def vitals_window():
+        pid = patient()['id']
+        vitals = vitals_store.load_vitals(pid)
+        end = pd.Timestamp(vitals.span()[1])
+        start = end - timedelta(days=VITALS_DAYS)
+        filtered = vitals.range(start, end)
+        max_points = downsample.max_points_for_width(CHART_WIDTH)
+        resolution = vitals_rollups.choose_resolution(end - start, len(filtered), max_points)
+        if resolution == 'raw':
+            data = filtered.reset_index(drop=True)
+        else:
+            data = vitals_rollups.load_rollups(pid).range(resolution, start, end).reset_index(drop=True)
+        state['window'] = (data, filtered, resolution, max_points)
+        return state['window']
+
+    def vitals_figures():
+        data, filtered, resolution, max_points = state['window']
+        for build in [st_app.heart_rate_figure, st_app.blood_pressure_figure, st_app.oxygen_figure,
+                      st_app.glucose_figure]:
+            build(data, filtered, resolution, max_points, DOWNSAMPLING).to_json()
+
+    def combined_figure():
+        data, filtered, resolution, max_points = state['window']
+        st_app.combined_vitals_figure(data, filtered, resolution, max_points, DOWNSAMPLING).to_json()
+
+    # Rerun with every figure in the figure cache: decode, append the live reading, serialize
+    def cached_figures():
+        data, filtered, resolution, max_points = state['window']
+        live = data.iloc[-1].to_dict() if resolution == 'raw' and len(data) else None
+        for name, build, columns in [
+            ('heart_rate', st_app.heart_rate_figure, ['heart_rate']),
+            ('blood_pressure', st_app.blood_pressure_figure, ['blood_pressure_systolic', 'blood_pressure_diastolic']),
+            ('oxygen_saturation', st_app.oxygen_figure, ['oxygen_saturation']),
+            ('glucose', st_app.glucose_figure, ['glucose']),
+        ]:
+            serialized = figure_cache.cached_figure(
+                ('benchmark', scale, name), (resolution, len(data)),
+                lambda: build(data, filtered, resolution, max_points, DOWNSAMPLING))
+            if live is None:
+                figure = figure_cache.load_figure(serialized)
+            else:
+                figure = figure_cache.load_figure(serialized, live['datetime'], live, columns)
+            figure.to_json()
+
+    # Reports: facet query over every option and the full date range, then the first page
+    def reports_page():
+        pid = patient()['id']
+        reports = reports_store.load_reports(pid)
+        report_facets = facets.load_report_facets(pid)
+        start, end = report_facets.date_bounds()
+        rows, _ = report_facets.query({'source': report_facets.options('source'),
+                                       'report_type': report_facets.options('report_type')}, start, end)
+        mask = np.zeros(len(report_facets), dtype=bool)
+        mask[rows] = True
+        reports.page(None, reports_store.PAGE_SIZE, mask)
+
+    # Comments: newest-first facet query and the HTML of every card
+    def comments_list():
+        comment_facets = facets.load_comment_facets(patient()['id'])
+        rows, _ = comment_facets.query({'profession': comment_facets.options('profession'),
+                                        'topic': comment_facets.options('topic')}, descending=True)
+        ''.join(html_blocks.comment_card(c) for c in comment_facets.rows(rows).to_dict('records'))
+
+    # Timeline: component data, table view and the HTML of every event
+    def timeline_view():
+        timeline = condition_timeline.load_timeline(patient()['id'])
+        timeline.timeline_data(timeline.conditions)
+        timeline.table(timeline.conditions)
+        for condition in timeline.conditions:
+            ''.join(html_blocks.timeline_event(event) for event in timeline.condition_events(condition))
+
+    return [
+        ('generate_patient_data', generate_roster, None),
+        ('ensure_data_exists (cold)', st_app.ensure_data_exists, data_store.clear),
+        ('ensure_data_exists (warm)', st_app.ensure_data_exists, None),
+        ('process_patient_data', process_rows, decode_rows),
+        ('patient_index decode (cold)', load_index, data_store.clear),
+        ('generate_vital_signs', generate_vitals, None),
+        ('generate_medical_reports', generate_reports, None),
+        ('generate_comments', generate_comments, None),
+        ('generate_conditions_timeline', generate_timeline, None),
+        ('vitals filter (cold)', vitals_window, data_store.clear),
+        ('vitals filter (warm)', vitals_window, None),
+        ('vitals figures (separate)', vitals_figures, None),
+        ('vitals figures (combined)', combined_figure, None),
+        # The untimed setup run fills the figure cache
+        ('vitals figures (cached rerun)', cached_figures, cached_figures),
+        ('reports filter (cold)', reports_page, data_store.clear),
+        ('reports filter (warm)', reports_page, None),
+        ('comments filter (cold)', comments_list, data_store.clear),
+        ('comments filter (warm)', comments_list, None),
+        ('timeline filter (cold)', timeline_view, lambda: (tile_timeline(), data_store.clear())),
+        ('timeline filter (warm)', timeline_view, None),
+    ]
+
+
+# Run every stage at every scale inside `workdir`; returns the results document
+def run_benchmarks(scales=SCALES, repeat=REPEAT, seed=SEED, workdir=None, only=None):
+    stub_streamlit()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    # Imported after the chdir: data_gen creates data/ in the working directory on import
+    import data_store
+
+    results = {}
+    for scale in scales:
+        print(f"Scale {scale:,}", flush=True)
+        scale_results = results.setdefault(str(scale), {})
+        for name, fn, setup in build_stages(scale, seed):
+            if only and not any(word in name for word in only):
+                # Skipped stages still run once: later stages depend on their output
+                if setup is not None:
+                    setup()
+                fn()
+                continue
+            scale_results[name] = measure(fn, repeat, setup)
+            print(f"  {name:<34} {scale_results[name]['median_s'] * 1000:10.1f} ms", flush=True)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'backend': data_store.BACKEND,
+            'repeat': repeat,
+            'seed': seed,
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+        'results': results,
+    }
+
+
+# Stages of `current` slower than `baseline` by more than `threshold`, as
+# (scale, stage, baseline seconds, current seconds) tuples. Best times are
+# compared: they are far less sensitive to other load on the machine than medians.
+def find_regressions(current, baseline, threshold=THRESHOLD, min_seconds=MIN_SECONDS):
+    regressions = []
+    for scale, stages in current['results'].items():
+        for name, result in stages.items():
+            before = baseline['results'].get(scale, {}).get(name)
+            if before is None:
+                continue
+            now, then = result['min_s'], before['min_s']
+            if now > then * (1 + threshold) and max(now, then) >= min_seconds:
+                regressions.append((scale, name, then, now))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the patient dashboard")
+    parser.add_argument("--scales", default=','.join(map(str, SCALES)), help="comma-separated scales")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per stage (the median is reported, the best run is compared)")
+    parser.add_argument("--seed", type=int, default=SEED, help="seed for the generated data")
+    parser.add_argument("--stages", default=None, help="comma-separated substrings of the stages to time")
+    parser.add_argument("--output", default="benchmark_results.json", help="results file")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--workdir", default=None, help="scratch directory (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='dashboard-bench-')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    try:
+        report = run_benchmarks([int(s) for s in args.scales.split(',')], args.repeat, args.seed, workdir,
+                                args.stages.split(',') if args.stages else None)
+    finally:
+        os.chdir(os.path.dirname(output))
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.threshold)
+        for scale, name, then, now in regressions:
+            print(f"REGRESSION scale {scale}: {name} {then * 1000:.1f} ms -> {now * 1000:.1f} ms "
+                  f"({now / then - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%} against {baseline_path}")
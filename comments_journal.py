@@ -0,0 +1,220 @@
+import os
+import io
+import csv
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import data_store
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# Append-only journal for clinician comments.
+#
+# New comments are appended as a single CSV line to comments_{id}.csv, so the
+# file stays a plain CSV for every existing reader and a submission costs O(1)
+# however long the history is. Writers serialize on an exclusive lock file next
+# to the CSV, which also guards a small state file holding the last issued
+# comment number: IDs are handed out under the lock and never reused, even when
+# two clinicians submit at the same moment from different processes. The state
+# also records the CSV's signature after the journal's last write: if the file
+# was rewritten behind its back (e.g. regenerated), the counter is checked
+# against the IDs actually in the file before another one is issued.
+#
+# Appended lines land at the end of the file, out of the newest-first order the
+# generator writes. Every COMPACT_EVERY appends a background compaction rewrites
+# the file (newest first, duplicate IDs and torn lines dropped) to a temporary
+# file that atomically replaces the original.
+#
+# With the SQLite backend a comment is a single INSERT whose ID comes from a
+# sequence advanced in the same transaction, and there is nothing to compact.
+
+COLUMNS = ['id', 'patient_id', 'date', 'name', 'profession', 'comment', 'topic']
+
+# Appends between two compactions of a patient's comments
+COMPACT_EVERY = 50
+
+# Seconds to wait for the lock when fcntl is unavailable
+LOCK_TIMEOUT = 10
+
+
+def _lock_path(path):
+    return path + '.lock'
+
+def _state_path(path):
+    return path + '.journal.json'
+
+# Exclusive lock shared by every process writing the comments at `path`
+@contextmanager
+def file_lock(path):
+    lock_path = _lock_path(path)
+    if fcntl is not None:
+        with open(lock_path, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        return
+
+    # Fallback: the lock is held while an exclusively created marker file exists
+    marker = lock_path + '.held'
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for lock on {path}")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.remove(marker)
+
+
+# Numeric part of a comment ID ('C014' -> 14), or 0 if it has none
+def _number(comment_id):
+    digits = ''.join(ch for ch in str(comment_id) if ch.isdigit())
+    return int(digits) if digits else 0
+
+# (mtime, size) of the comments file, or None if it does not exist
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+# Highest comment number in the CSV
+def _max_id(path):
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return 0
+    ids = pd.read_csv(path, usecols=['id'], on_bad_lines='skip')['id']
+    return max((_number(i) for i in ids), default=0)
+
+# Journal state (last issued number, appends since compaction, file signature);
+# call under the lock. Missing state, or state whose signature no longer matches
+# the file, is reconciled with the IDs in the CSV so no existing ID is reissued.
+def _read_state(path):
+    try:
+        with open(_state_path(path)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = None
+    if state is not None and state.get('signature') == _file_signature(path):
+        return state
+    last = max(_max_id(path), state['last_id'] if state else 0)
+    return {'last_id': last, 'appended': 0, 'signature': _file_signature(path)}
+
+def _write_state(path, state):
+    temp = _state_path(path) + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp, _state_path(path))
+
+# Column order of an existing comments file (its header line)
+def _header(path):
+    with open(path, newline='') as f:
+        return next(csv.reader(f), COLUMNS)
+
+# One CSV line (quoted the way pandas writes it) for a comment
+def _format_row(comment, columns):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow([comment.get(column, '') for column in columns])
+    return buffer.getvalue()
+
+
+# Append a comment for a patient and return it (with its new ID and timestamp)
+def append_comment(patient_id, name, profession, comment, topic, date=None):
+    entry = {
+        'patient_id': patient_id,
+        'date': (date or datetime.now()).strftime('%Y-%m-%d %H:%M:%S'),
+        'name': name,
+        'profession': profession,
+        'comment': comment,
+        'topic': topic,
+    }
+    if data_store.BACKEND == 'sqlite':
+        import sqlite_store
+        return sqlite_store.append_comment(patient_id, entry)
+
+    path = data_store.comments_path(patient_id)
+    with file_lock(path):
+        state = _read_state(path)
+        state['last_id'] += 1
+        state['appended'] += 1
+        entry = dict(entry, id=f"C{state['last_id']:03d}")
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        columns = _header(path) if exists else COLUMNS
+        text = _format_row(entry, columns)
+        if not exists:
+            text = _format_row(dict(zip(columns, columns)), columns) + text
+        else:
+            # Never glue the new line onto an unterminated last line
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    text = '\n' + text
+
+        # The ID is reserved before the line is written: a crash in between
+        # leaves a gap in the numbering, never a reused ID
+        _write_state(path, state)
+
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, text.encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        state['signature'] = _file_signature(path)
+        _write_state(path, state)
+        needs_compaction = state['appended'] >= COMPACT_EVERY
+
+    data_store.invalidate(path)
+    if needs_compaction:
+        compact_in_background(patient_id)
+    return entry
+
+# Rewrite a patient's comments newest first, keeping the last copy of each ID.
+# Returns the number of comments kept.
+def compact(patient_id):
+    if data_store.BACKEND == 'sqlite':
+        return len(data_store.read_table('comments', patient_id))
+
+    path = data_store.comments_path(patient_id)
+    with file_lock(path):
+        if not os.path.exists(path):
+            return 0
+        state = _read_state(path)
+        comments = pd.read_csv(path, on_bad_lines='skip', dtype=str, keep_default_na=False)
+        comments = comments[comments['id'] != '']
+        comments = comments.drop_duplicates('id', keep='last')
+        comments = comments.sort_values('date', ascending=False, kind='stable')
+
+        temp = path + '.compact.tmp'
+        comments.to_csv(temp, index=False)
+        os.replace(temp, path)
+
+        state['appended'] = 0
+        state['last_id'] = max([state['last_id']] + [_number(i) for i in comments['id']])
+        state['signature'] = _file_signature(path)
+        _write_state(path, state)
+
+    data_store.invalidate(path)
+    return len(comments)
+
+# Compact a patient's comments on a daemon thread
+def compact_in_background(patient_id):
+    thread = threading.Thread(target=compact, args=(patient_id,), daemon=True, name=f"compact-{patient_id}")
+    thread.start()
+    return thread
@@ -0,0 +1,112 @@
+import data_store
+from facets import FacetIndex
+
+# In-memory model of a patient's condition timeline.
+#
+# Built once per version of the condition timeline table and derived from it
+# alone: events are grouped by condition (oldest first) and every event's
+# vis-timeline item is prepared up front, so the timeline component, the
+# per-condition event lists and the filtered table all come straight from the
+# model on a rerun. Selections that were already rendered are memoized.
+
+CONDITION_COLORS = {
+    'Hypertension': '#ff6b6b',            # Red
+    'Diabetes Type 2': '#48dbfb',         # Blue
+    'Asthma': '#1dd1a1',                  # Green
+    'Arthritis': '#feca57',               # Yellow
+    'Obesity': '#5f27cd',                 # Purple
+    'Coronary Artery Disease': '#ee5253', # Dark Red
+    'COPD': '#a29bfe',                    # Lavender
+    'Depression': '#54a0ff',              # Light Blue
+    'Anxiety': '#ff9ff3',                 # Pink
+    'Hypothyroidism': '#00d2d3',          # Teal
+}
+DEFAULT_COLOR = '#dfe6e9'
+
+SEVERITY_BACKGROUNDS = {
+    'Mild': 'rgba(46, 213, 115, 0.2)',      # Light green
+    'Moderate': 'rgba(255, 165, 2, 0.2)',   # Light orange
+    'Severe': 'rgba(255, 71, 87, 0.2)',     # Light red
+}
+DEFAULT_BACKGROUND = 'rgba(200, 200, 200, 0.2)'
+
+# Timeline selections remembered per model
+MAX_CACHED_SELECTIONS = 32
+
+
+# vis-timeline item for one event (`number` is its 1-based position in the table)
+def timeline_item(number, event):
+    color = CONDITION_COLORS.get(event['condition'], DEFAULT_COLOR)
+    background = SEVERITY_BACKGROUNDS.get(event['severity'], DEFAULT_BACKGROUND)
+    return {
+        'id': str(number),
+        'content': f"{event['event_type']}: {event['condition']}",
+        'start': event['date'],
+        'group': event['condition'],
+        'className': f"severity-{str(event['severity']).lower()}",
+        'title': f"{event['description']}<br>Severity: {event['severity']}<br>Provider: {event['healthcare_provider']}",
+        'style': f"background-color: {background}; color: {color}; border-color: {color};",
+    }
+
+# vis-timeline group for a condition
+def timeline_group(condition):
+    return {
+        'id': condition,
+        'content': condition,
+        'style': f"color: {CONDITION_COLORS.get(condition, DEFAULT_COLOR)};",
+    }
+
+
+class TimelineModel:
+    def __init__(self, frame):
+        self.facets = FacetIndex(frame, ['condition'])
+        self.frame = self.facets.frame
+        self.conditions = self.facets.options('condition')
+
+        records = self.frame.to_dict('records')
+        items = [timeline_item(i + 1, event) for i, event in enumerate(records)]
+
+        # Oldest first within each condition (row order breaks ties, as in the table)
+        self.events = {condition: [] for condition in self.conditions}
+        self.items = {condition: [] for condition in self.conditions}
+        for position in self.facets.order:
+            event = records[position]
+            self.events[event['condition']].append(event)
+            self.items[event['condition']].append(items[position])
+        self.groups = {condition: timeline_group(condition) for condition in self.conditions}
+
+        self._selections = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    # Events of one condition, oldest first
+    def condition_events(self, condition):
+        return self.events.get(condition, [])
+
+    # vis-timeline data ({'items', 'groups'}) for the selected conditions
+    def timeline_data(self, conditions):
+        key = tuple(conditions)
+        data = self._selections.get(key)
+        if data is None:
+            selected = [c for c in conditions if c in self.groups]
+            data = {
+                'items': [item for condition in selected for item in self.items[condition]],
+                'groups': [self.groups[condition] for condition in selected],
+            }
+            if len(self._selections) >= MAX_CACHED_SELECTIONS:
+                self._selections.clear()
+            self._selections[key] = data
+        return data
+
+    # Events of the selected conditions as a frame, oldest first
+    def table(self, conditions):
+        rows, _ = self.facets.query({'condition': list(conditions)})
+        return self.facets.rows(rows)
+
+
+# Timeline model of a patient (None if there is no condition timeline)
+def load_timeline(patient_id):
+    if not data_store.table_exists('condition_timeline', patient_id):
+        return None
+    return data_store.load_table('condition_timeline', patient_id, TimelineModel, kind='timeline_model')
@@ -0,0 +1,183 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Process-wide cache for everything the dashboard reads from the data directory.
+# Entries are keyed by normalised file path and validated against the file's
+# (mtime, size) signature, so a rerun that finds an unchanged file never touches
+# its contents again. Streamlit only re-executes the main script on rerun, so this
+# module (and its cache) lives for the lifetime of the server process.
+
+DATA_DIR = 'data'
+
+# Storage backend: 'csv' (files under DATA_DIR) or 'sqlite' (one database file,
+# see sqlite_store). Both are configured through the environment.
+BACKEND = os.environ.get('DASHBOARD_BACKEND', 'csv').lower()
+SQLITE_PATH = os.environ.get('DASHBOARD_DB', os.path.join(DATA_DIR, 'dashboard.db'))
+
+# Upper bound on cached files; least recently used entries are evicted first
+MAX_ENTRIES = 4096
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+
+# Paths of the per-patient files used across the app
+def patients_path():
+    return os.path.join(DATA_DIR, 'patients.csv')
+
+def vitals_path(patient_id):
+    return os.path.join(DATA_DIR, f'vitals_{patient_id}.csv')
+
+def reports_path(patient_id):
+    return os.path.join(DATA_DIR, f'reports_{patient_id}.csv')
+
+def comments_path(patient_id):
+    return os.path.join(DATA_DIR, f'comments_{patient_id}.csv')
+
+def condition_timeline_path(patient_id):
+    return os.path.join(DATA_DIR, f'condition_timeline_{patient_id}.csv')
+
+
+# CSV file behind a table (patient_id is ignored for 'patients')
+def table_path(table, patient_id=None):
+    if table == 'patients':
+        return patients_path()
+    return os.path.join(DATA_DIR, f'{table}_{patient_id}.csv')
+
+
+def _normalize(path):
+    return os.path.normpath(os.path.abspath(path))
+
+# Signature used to detect on-disk changes (raises FileNotFoundError if missing)
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Return the cached value for path, loading it with loader(path) on a miss
+def cached_load(path, loader, kind='raw'):
+    key = (_normalize(path), kind)
+    return _cached(key, _signature(key[0]), lambda: loader(path))
+
+# Cache lookup for any key whose contents are described by `signature`
+def _cached(key, signature, load):
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == signature:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return entry[1]
+
+    value = load()
+
+    with _lock:
+        _stats['misses'] += 1
+        _cache[key] = (signature, value)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+            _stats['evictions'] += 1
+    return value
+
+# Cached equivalent of pd.read_csv. The frame is shared between reruns, so a
+# shallow copy is handed out to keep column additions out of the cache.
+def read_csv(path):
+    return cached_load(path, pd.read_csv, kind='csv').copy(deep=False)
+
+# Cached equivalent of json.load on a file
+def read_json(path):
+    def _load(p):
+        with open(p, 'r') as f:
+            return json.load(f)
+    return cached_load(path, _load, kind='json')
+
+# Backend-independent access to the dashboard tables. In CSV mode these are
+# thin wrappers around the file cache; in SQLite mode entries are validated
+# against the table's revision instead of a file signature.
+
+def _table_key(table, patient_id, kind):
+    import sqlite_store
+    return (_normalize(SQLITE_PATH), table, patient_id, kind), sqlite_store.version(table, patient_id)
+
+# True if the table (or the patient's rows of it) has been written
+def table_exists(table, patient_id=None):
+    if BACKEND == 'sqlite':
+        import sqlite_store
+        return sqlite_store.version(table, patient_id) > 0
+    return os.path.exists(table_path(table, patient_id))
+
+# Token that changes whenever the table (or the patient's rows of it) is
+# rewritten: the SQLite revision, or the CSV file's signature (None if missing)
+def table_version(table, patient_id=None):
+    if BACKEND == 'sqlite':
+        import sqlite_store
+        return sqlite_store.version(table, patient_id)
+    try:
+        return _signature(table_path(table, patient_id))
+    except FileNotFoundError:
+        return None
+
+# Cached build(frame) for a table; with no build function, the frame itself
+def load_table(table, patient_id=None, build=None, kind='csv'):
+    build = build or (lambda frame: frame)
+    if BACKEND == 'sqlite':
+        import sqlite_store
+        key, signature = _table_key(table, patient_id, kind)
+        return _cached(key, signature, lambda: build(sqlite_store.read_table(table, patient_id)))
+    return cached_load(table_path(table, patient_id), lambda p: build(pd.read_csv(p)), kind=kind)
+
+# Cached compute() for a value derived from a table, refreshed whenever the table changes
+def load_derived(table, patient_id, compute, kind):
+    if BACKEND == 'sqlite':
+        key, signature = _table_key(table, patient_id, kind)
+        return _cached(key, signature, compute)
+    return cached_load(table_path(table, patient_id), lambda p: compute(), kind=kind)
+
+# Cached frame of a table (a shallow copy, like read_csv)
+def read_table(table, patient_id=None):
+    return load_table(table, patient_id).copy(deep=False)
+
+# Replace a table (or the patient's rows of it) with a DataFrame
+def save_table(df, table, patient_id=None):
+    if BACKEND == 'sqlite':
+        import sqlite_store
+        sqlite_store.write_table(table, df, patient_id)
+    else:
+        write_csv(df, table_path(table, patient_id))
+
+# Drop every cached entry derived from path
+def invalidate(path):
+    norm = _normalize(path)
+    with _lock:
+        for key in [k for k in _cache if k[0] == norm]:
+            del _cache[key]
+            _stats['invalidations'] += 1
+
+# Drop the whole cache (e.g. after regenerating the data directory)
+def clear():
+    with _lock:
+        _stats['invalidations'] += len(_cache)
+        _cache.clear()
+
+# Write a DataFrame and invalidate exactly the entry it replaces
+def write_csv(df, path):
+    df.to_csv(path, index=False)
+    invalidate(path)
+
+# Hit/miss counters for the cache
+def cache_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_cache)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+def reset_stats():
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,104 @@
+import numpy as np
+
+# Downsampling for the vitals history charts.
+#
+# Both methods return sorted row positions into the original series, so the
+# charts keep real readings (and real timestamps) rather than averages.
+#  - 'minmax' splits the series into buckets and keeps each bucket's minimum and
+#    maximum: every excursion outside the normal range stays visible.
+#  - 'lttb' (Largest-Triangle-Three-Buckets) keeps the points that best preserve
+#    the visual shape of the line.
+
+METHODS = ['minmax', 'lttb']
+
+# Points drawn per horizontal pixel of chart width
+POINTS_PER_PIXEL = 2
+
+
+# Largest useful number of points for a trace drawn at the given width
+def max_points_for_width(width_px, points_per_pixel=POINTS_PER_PIXEL):
+    return max(4, int(width_px * points_per_pixel))
+
+# Bucket boundaries splitting n points into `buckets` nearly equal parts
+def _bucket_edges(n, buckets):
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+# Min/max downsampling: two points per bucket, first and last always kept
+def minmax_indices(y, max_points):
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+
+    buckets = max(1, (max_points - 2) // 2)
+    edges = _bucket_edges(n - 2, buckets) + 1
+    size = int(np.max(np.diff(edges)))
+
+    # Pad every bucket to the same width so argmin/argmax run as one 2-D reduction
+    starts = edges[:-1]
+    lengths = np.diff(edges)
+    offsets = np.arange(size)
+    positions = starts[:, None] + np.minimum(offsets[None, :], lengths[:, None] - 1)
+    windows = y[positions]
+    valid = offsets[None, :] < lengths[:, None]
+    low = np.where(valid, windows, np.inf)
+    high = np.where(valid, windows, -np.inf)
+
+    picked = np.concatenate((
+        [0],
+        positions[np.arange(buckets), np.argmin(low, axis=1)],
+        positions[np.arange(buckets), np.argmax(high, axis=1)],
+        [n - 1],
+    ))
+    return np.unique(picked)
+
+# Largest-Triangle-Three-Buckets downsampling
+def lttb_indices(x, y, max_points):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    edges = _bucket_edges(n - 2, max_points - 2) + 1
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = n - 1
+    previous = 0
+
+    for b in range(max_points - 2):
+        start, stop = edges[b], edges[b + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        if b + 2 < len(edges):
+            next_start, next_stop = edges[b + 1], edges[b + 2]
+            avg_x = x[next_start:next_stop].mean()
+            avg_y = y[next_start:next_stop].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        picked[b + 1] = previous
+
+    return picked
+
+# Positions to keep for a single trace
+def downsample_indices(x, y, max_points, method='minmax'):
+    if method == 'lttb':
+        return lttb_indices(x, y, max_points)
+    return minmax_indices(y, max_points)
+
+# Rows of `frame` to plot for the given value columns. The point budget is
+# shared between the columns and the union of their picks is returned, so a
+# figure with several traces keeps the extremes of each one.
+def downsample_frame(frame, columns, max_points, method='minmax', x='datetime'):
+    if method is None or len(frame) <= max_points:
+        return frame
+
+    budget = max(4, max_points // len(columns))
+    x_values = frame[x].to_numpy().astype('datetime64[ns]').astype(np.int64)
+    keep = np.unique(np.concatenate([
+        downsample_indices(x_values, frame[column].to_numpy(), budget, method) for column in columns
+    ]))
+    return frame.iloc[keep]
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+import data_store
+import reports_store
+
+# Faceted filtering for the reports, comments and condition timeline sections.
+#
+# A FacetIndex is built once per table version. Every facet column is encoded
+# as categorical codes with one packed bitmap per category (a bit per row), and
+# the date column is parsed once and kept with its sorted row order. A query
+# ORs the bitmaps of the selected categories of each facet, ANDs the facets
+# with the date range, and returns the matching rows already in date order
+# together with per-facet counts. A facet's counts apply every filter except
+# its own, so they show how many rows each option would bring back.
+
+DATE = 'date'
+
+
+def _and(masks, n_bytes):
+    result = np.full(n_bytes, 0xFF, dtype=np.uint8)
+    for mask in masks:
+        result &= mask
+    return result
+
+
+class FacetIndex:
+    def __init__(self, frame, facets, date_column=DATE):
+        self.frame = frame.reset_index(drop=True)
+        self.size = len(self.frame)
+        self.n_bytes = (self.size + 7) // 8
+
+        self.categories = {}
+        self.codes = {}
+        self.bitmaps = {}
+        for facet in facets:
+            codes, categories = pd.factorize(self.frame[facet], sort=True)
+            self.categories[facet] = list(categories)
+            self.codes[facet] = codes
+            members = codes[None, :] == np.arange(len(categories))[:, None]
+            self.bitmaps[facet] = np.packbits(members, axis=1).reshape(len(categories), self.n_bytes)
+
+        dates = pd.to_datetime(self.frame[date_column], format='ISO8601').to_numpy(dtype='datetime64[ns]')
+        self.order = np.argsort(dates, kind='stable')
+        self.sorted_dates = dates[self.order]
+
+    def __len__(self):
+        return self.size
+
+    # Values of a facet, sorted
+    def options(self, facet):
+        return self.categories[facet]
+
+    # First and last date, or (None, None) when there are no rows
+    def date_bounds(self):
+        if not self.size:
+            return None, None
+        return pd.Timestamp(self.sorted_dates[0]), pd.Timestamp(self.sorted_dates[-1])
+
+    # Packed bitmap of the rows whose facet value is one of `values`
+    def _facet_mask(self, facet, values):
+        lookup = {category: i for i, category in enumerate(self.categories[facet])}
+        picked = [lookup[value] for value in values if value in lookup]
+        if not picked:
+            return np.zeros(self.n_bytes, dtype=np.uint8)
+        return np.bitwise_or.reduce(self.bitmaps[facet][picked], axis=0)
+
+    # Positions [i, j) in date order of the rows between the days start and end (inclusive)
+    def _date_bounds(self, start, end):
+        i = 0 if start is None else int(np.searchsorted(self.sorted_dates, np.datetime64(pd.Timestamp(start).normalize(), 'ns'), side='left'))
+        j = self.size if end is None else int(np.searchsorted(
+            self.sorted_dates, np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1), 'ns'), side='left'))
+        return i, max(i, j)
+
+    # Filter by facet selections ({facet: values}, a missing facet or None means
+    # no filter) and an inclusive day range. Returns the matching row positions
+    # in date order and {facet: pd.Series of counts per value}.
+    def query(self, selections=None, start=None, end=None, descending=False):
+        selections = {facet: values for facet, values in (selections or {}).items() if values is not None}
+        masks = {facet: self._facet_mask(facet, values) for facet, values in selections.items()}
+
+        i, j = self._date_bounds(start, end)
+        if i > 0 or j < self.size:
+            in_range = np.zeros(self.size, dtype=bool)
+            in_range[self.order[i:j]] = True
+            masks[DATE] = np.packbits(in_range)
+
+        counts = {}
+        for facet, codes in self.codes.items():
+            others = np.unpackbits(_and([m for name, m in masks.items() if name != facet], self.n_bytes),
+                                   count=self.size).view(bool)
+            counts[facet] = pd.Series(np.bincount(codes[others & (codes >= 0)], minlength=len(self.categories[facet])),
+                                      index=self.categories[facet])
+
+        matched = np.unpackbits(_and(masks.values(), self.n_bytes), count=self.size).view(bool)
+        rows = self.order[i:j]
+        rows = rows[matched[rows]]
+        return (rows[::-1] if descending else rows), counts
+
+    # Rows of the frame for the positions returned by query()
+    def rows(self, positions):
+        return self.frame.iloc[positions]
+
+
+# Facets of a patient's reports, aligned with reports_store.ReportIndex rows
+def load_report_facets(patient_id):
+    reports = reports_store.load_reports(patient_id)
+    if reports is None:
+        return None
+    return data_store.load_derived('reports', patient_id,
+                                   lambda: FacetIndex(reports.frame, ['source', 'report_type']), kind='report_facets')
+
+# Facets of a patient's comments (None if the patient has none)
+def load_comment_facets(patient_id):
+    if not data_store.table_exists('comments', patient_id):
+        return None
+    return data_store.load_table('comments', patient_id, lambda frame: FacetIndex(frame, ['profession', 'topic']),
+                                 kind='comment_facets')
@@ -0,0 +1,110 @@
+import json
+import base64
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Serialized Plotly figures shared between reruns.
+#
+# Building a history chart (Plotly Express, reference lines, rollup bands,
+# alert shading) and validating it costs far more than drawing it. Figures are
+# therefore built once per key (patient, period, chart and view settings) and
+# kept as their JSON, validated against a signature describing the data they
+# were drawn from (the vitals table version and the plotted window). A rerun
+# only decodes the JSON, appends the newest live reading to the traces that
+# follow it and stretches the reference lines to that reading, then wraps the
+# result in a Figure without validating it again.
+
+# Upper bound on cached figures; least recently used entries are evicted first
+MAX_FIGURES = 256
+
+_figures = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+# Serialized figure for `key`, rebuilt with build() when `signature` changes
+def cached_figure(key, signature, build):
+    with _lock:
+        entry = _figures.get(key)
+        if entry is not None and entry[0] == signature:
+            _figures.move_to_end(key)
+            _stats['hits'] += 1
+            return entry[1]
+
+    serialized = build().to_json()
+
+    with _lock:
+        _stats['misses'] += 1
+        _figures[key] = (signature, serialized)
+        _figures.move_to_end(key)
+        while len(_figures) > MAX_FIGURES:
+            _figures.popitem(last=False)
+    return serialized
+
+
+def _is_typed(values):
+    return isinstance(values, dict) and 'bdata' in values
+
+# True if `value` is stored exactly by a typed array of `dtype`
+def _fits(value, dtype):
+    if dtype.kind == 'f':
+        return True
+    info = np.iinfo(dtype)
+    return float(value).is_integer() and info.min <= value <= info.max
+
+# A serialized data array with `value` appended. Base64 typed arrays stay typed
+# (widened to float64 when the value does not fit their dtype).
+def _append(values, value):
+    if not _is_typed(values):
+        return list(values or []) + [value]
+    array = np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype'])
+    dtype = array.dtype if _fits(value, array.dtype) else np.dtype('f8')
+    array = np.append(array.astype(dtype), np.asarray(value, dtype=dtype))
+    return {'dtype': dtype.str[1:], 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+# Append the reading at `timestamp` to the traces of a figure spec. `columns`
+# gives, per trace index, the key of `reading` that trace plots.
+def append_point(spec, timestamp, reading, columns):
+    timestamp = pd.Timestamp(timestamp)
+    x = timestamp.isoformat()
+    for index, column in enumerate(columns):
+        trace = spec['data'][index]
+        # Numeric x values are epoch milliseconds on a date axis
+        point = timestamp.value / 1e6 if _is_typed(trace.get('x')) else x
+        trace['x'] = _append(trace.get('x'), point)
+        trace['y'] = _append(trace.get('y'), reading[column])
+
+    # Reference lines span the plotted data, so they end at the new reading
+    # (lines drawn across the axis domain already span the whole chart)
+    for shape in spec['layout'].get('shapes', []):
+        if shape.get('type') == 'line' and 'domain' not in str(shape.get('xref', '')):
+            if shape.get('x0') is None:
+                shape['x0'] = x
+            if shape.get('x1') is None or str(shape['x1']) < x:
+                shape['x1'] = x
+    return spec
+
+# Figure for a serialized spec, with the live reading appended when given
+def load_figure(serialized, timestamp=None, reading=None, columns=()):
+    spec = json.loads(serialized)
+    if reading is not None:
+        append_point(spec, timestamp, reading, columns)
+    # The spec came from a validated figure; validating it again is the slow part
+    return go.Figure(spec, _validate=False)
+
+
+# Hit/miss counters for the figure cache
+def cache_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_figures)
+    return stats
+
+# Drop every cached figure
+def clear():
+    with _lock:
+        _figures.clear()
@@ -0,0 +1,69 @@
+import html
+
+import pandas as pd
+import streamlit as st
+
+# HTML building blocks for lists and card grids.
+#
+# Each st.markdown call is a separate element (and websocket delta), so lists
+# that made one call per item cost more the longer they grew. These helpers
+# build a whole list or card grid as one string and emit it with a single
+# call. Every value taken from the data is escaped (comment text is entered by
+# users), line breaks become <br> and the markup never contains blank lines or
+# indentation, so Markdown leaves the HTML block alone.
+
+# CSS class of an event's severity
+SEVERITY_CLASSES = {
+    'Moderate': 'warning-value',
+    'Severe': 'danger-value',
+}
+DEFAULT_SEVERITY_CLASS = 'normal-value'
+
+
+# Escaped text for a value (empty for missing values), with line breaks kept
+def escape(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    text = html.escape(str(value))
+    return text.replace('\r\n', '\n').replace('\n', '<br>')
+
+# Card for one clinician comment
+def comment_card(comment):
+    return (
+        '<div class="comment-box">'
+        f'<strong>{escape(comment["name"])}</strong> ({escape(comment["profession"])}) - <em>{escape(comment["date"])}</em>'
+        f'<br><strong>Topic:</strong> {escape(comment["topic"])}'
+        f'<br><br>{escape(comment["comment"])}'
+        '</div>'
+    )
+
+# Entry for one condition timeline event
+def timeline_event(event):
+    severity_class = SEVERITY_CLASSES.get(event['severity'], DEFAULT_SEVERITY_CLASS)
+    return (
+        '<div class="timeline-item">'
+        f'<strong>{escape(event["date"])}</strong> - <strong>{escape(event["event_type"])}</strong>'
+        f'<br><span class="{severity_class}">Severity: {escape(event["severity"])}</span>'
+        f'<br>{escape(event["description"])}'
+        f'<br><small>Provider: {escape(event["healthcare_provider"])}</small>'
+        '</div>'
+    )
+
+# KPI card with a title, a value and its unit (css_class colors the value)
+def kpi_card(title, value, unit='', css_class='', value_style=''):
+    style = f' style="{value_style}"' if value_style else ''
+    return (
+        '<div class="kpi-card">'
+        f'<p class="kpi-title">{escape(title)}</p>'
+        f'<p class="kpi-value {css_class}"{style}>{escape(value)} <span style="font-size:1rem">{escape(unit)}</span></p>'
+        '</div>'
+    )
+
+# Row of cards laid out on a grid of `columns` equal columns
+def card_grid(cards, columns):
+    return (f'<div class="card-grid" style="grid-template-columns: repeat({columns}, minmax(0, 1fr));">'
+            + ''.join(cards) + '</div>')
+
+# Emit blocks of HTML as a single element
+def render(*blocks):
+    st.markdown(''.join(blocks), unsafe_allow_html=True)
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from ring_buffer import RingBuffer
+
+# Live vitals streaming for the monitoring section.
+#
+# A single daemon producer thread serves every viewer in the process: each
+# browser session registers at most one stream (session -> patient), and the
+# producer appends a new reading to every registered stream's buffer once per
+# tick. The page only polls its own buffer from a timed fragment, so the script
+# thread is never blocked. Streams are dropped when the viewer stops them,
+# switches patient, or stops polling (closed tab / ended session), and a stream
+# whose reading source fails is logged and dropped.
+
+# Seconds between readings
+TICK_SECONDS = 1.5
+
+# Readings kept per session for the live chart (the default window)
+BUFFER_SIZE = 20
+
+# Values recorded for every reading
+COLUMNS = ['heart_rate', 'blood_pressure_systolic', 'blood_pressure_diastolic', 'temperature',
+           'respiratory_rate', 'oxygen_saturation', 'glucose']
+
+# Streams that have not been polled for this long are considered abandoned
+IDLE_TIMEOUT = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+class LiveStream:
+    def __init__(self, patient_id, make_reading, buffer_size=BUFFER_SIZE):
+        self.patient_id = patient_id
+        self.make_reading = make_reading
+        self.buffer = RingBuffer(buffer_size, COLUMNS)
+        self.lock = threading.Lock()
+        self.last_poll = time.monotonic()
+
+    # Called from the producer thread; only the new sample is written
+    def produce(self):
+        now = datetime.now()
+        reading = self.make_reading(self.patient_id, now)
+        with self.lock:
+            self.buffer.push_reading(now, reading)
+
+    # Called from the session's script thread: (times, values[column, sample])
+    def snapshot(self):
+        self.last_poll = time.monotonic()
+        with self.lock:
+            return self.buffer.view()
+
+    def resize(self, buffer_size):
+        with self.lock:
+            if buffer_size != self.buffer.capacity:
+                self.buffer = self.buffer.resized(buffer_size)
+
+
+_streams = {}
+_streams_lock = threading.Lock()
+_producer = None
+
+
+# Producer loop shared by all sessions; exits once no streams remain
+def _run_producer():
+    global _producer
+    next_tick = time.monotonic()
+    while True:
+        now = time.monotonic()
+        with _streams_lock:
+            # Reap streams whose viewer has gone away
+            for session_id in [s for s, stream in _streams.items()
+                               if now - stream.last_poll > IDLE_TIMEOUT]:
+                del _streams[session_id]
+            if not _streams:
+                _producer = None
+                return
+            streams = list(_streams.items())
+
+        for session_id, stream in streams:
+            try:
+                stream.produce()
+            except Exception:
+                # A failing reading source must not take down other viewers;
+                # its own stream stops instead of failing on every tick
+                logger.exception('Live stream for patient %s failed; stopping it', stream.patient_id)
+                with _streams_lock:
+                    if _streams.get(session_id) is stream:
+                        del _streams[session_id]
+
+        next_tick += TICK_SECONDS
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+
+def _ensure_producer():
+    global _producer
+    if _producer is None:
+        _producer = threading.Thread(target=_run_producer, name='live-vitals-producer', daemon=True)
+        _producer.start()
+
+
+# Start (or restart) the stream for a session; replaces any previous stream
+def start(session_id, patient_id, make_reading, buffer_size=BUFFER_SIZE):
+    stream = LiveStream(patient_id, make_reading, buffer_size)
+    # First reading is produced immediately so the chart is never empty
+    stream.produce()
+    with _streams_lock:
+        _streams[session_id] = stream
+        _ensure_producer()
+    return stream
+
+# Stop the session's stream, if any
+def stop(session_id):
+    with _streams_lock:
+        return _streams.pop(session_id, None) is not None
+
+# Stop the session's stream if it belongs to a different patient
+def stop_unless(session_id, patient_id):
+    with _streams_lock:
+        stream = _streams.get(session_id)
+        if stream is not None and stream.patient_id != patient_id:
+            del _streams[session_id]
+            return True
+    return False
+
+def is_streaming(session_id, patient_id=None):
+    with _streams_lock:
+        stream = _streams.get(session_id)
+    return stream is not None and (patient_id is None or stream.patient_id == patient_id)
+
+# Change the session's window, keeping the most recent readings
+def set_window(session_id, buffer_size):
+    with _streams_lock:
+        stream = _streams.get(session_id)
+    if stream is not None:
+        stream.resize(buffer_size)
+
+# Current window for the session as (times, values[column, sample]),
+# or None if it is not streaming
+def poll(session_id):
+    with _streams_lock:
+        stream = _streams.get(session_id)
+    if stream is None:
+        return None
+    return stream.snapshot()
+
+def active_streams():
+    with _streams_lock:
+        return len(_streams)
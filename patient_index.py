@@ -0,0 +1,204 @@
+import ast  # for safely evaluating strings as literals
+import json
+import time
+import argparse
+
+import pandas as pd
+
+import data_store
+
+# Pre-parsed patient directory.
+#
+# patients.csv is loaded into an index once per file version (through the
+# data_store cache): ids map to row positions for O(1) lookup and the sidebar
+# labels are built in one vectorized pass. The nested fields (conditions,
+# medications, contacts, ...) stay encoded until a patient's full record is
+# actually requested, and each decoded record is memoized.
+#
+# Nested fields are stored as JSON, so a whole column decodes with a single
+# json.loads over the joined cells. Files written before the switch hold Python
+# literals (repr strings); those still load through a per-cell fallback and can
+# be converted once with `python patient_index.py migrate`.
+
+# Fields that need special handling
+DICT_FIELDS = ['emergency_contact', 'physician', 'insurance']
+LIST_FIELDS = ['conditions', 'medications', 'allergies']
+NESTED_FIELDS = DICT_FIELDS + LIST_FIELDS
+
+
+# Helper function to parse string representations of dictionaries
+def parse_dict_string(s):
+    if isinstance(s, str):
+        try:
+            # Try to parse the string as a Python literal
+            return ast.literal_eval(s)
+        except (SyntaxError, ValueError):
+            # If parsing fails, return the original string
+            return s
+    return s
+
+# Helper function to parse string representations of lists
+def parse_list_string(s):
+    if isinstance(s, str):
+        try:
+            # Try to parse the string as a Python literal
+            result = ast.literal_eval(s)
+            if isinstance(result, list):
+                return result
+            return [s]  # Return a list with the string if it's not a list
+        except (SyntaxError, ValueError):
+            # If parsing fails, return a list with the original string
+            return [s]
+    return s if isinstance(s, list) else [s]
+
+# Function to process patient data from CSV
+def process_patient_data(patient_dict):
+    for field in DICT_FIELDS:
+        if field in patient_dict:
+            patient_dict[field] = parse_dict_string(patient_dict[field])
+
+    for field in LIST_FIELDS:
+        if field in patient_dict:
+            patient_dict[field] = parse_list_string(patient_dict[field])
+
+    return patient_dict
+
+
+# Decode one stored cell of a nested field (JSON, or a legacy Python literal)
+def decode_value(value, field):
+    parse = parse_dict_string if field in DICT_FIELDS else parse_list_string
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return parse(value)
+    return parse(value)
+
+# Decode a whole column of a nested field. JSON cells are parsed in one call by
+# joining them into a single JSON array; anything else falls back to per-cell decoding.
+def decode_column(values, field):
+    values = pd.Series(values).tolist()
+    if all(isinstance(value, str) for value in values):
+        try:
+            decoded = json.loads('[' + ','.join(values) + ']')
+            if len(decoded) == len(values):
+                if field in LIST_FIELDS:
+                    return [value if isinstance(value, list) else [value] for value in decoded]
+                return decoded
+        except ValueError:
+            pass
+    return [decode_value(value, field) for value in values]
+
+# Copy of a patients frame with the nested fields encoded as JSON
+def encode_nested(frame):
+    frame = frame.copy()
+    for field in NESTED_FIELDS:
+        if field in frame.columns:
+            frame[field] = [json.dumps(value) for value in decode_column(frame[field], field)]
+    return frame
+
+# True if a patients file still stores nested fields as Python literals
+def is_legacy(path=None):
+    frame = pd.read_csv(path or data_store.patients_path(), nrows=1, usecols=lambda c: c in NESTED_FIELDS)
+    for field in frame.columns:
+        try:
+            json.loads(frame[field].iloc[0])
+        except (TypeError, ValueError):
+            return True
+    return False
+
+# Save patient records (a list of dicts or a DataFrame) with JSON nested fields
+def write_patients(patients, path=None):
+    frame = encode_nested(pd.DataFrame(patients))
+    if path is None:
+        data_store.save_table(frame, 'patients')
+    else:
+        data_store.write_csv(frame, path)
+
+# Convert a legacy patients file to JSON nested fields in place.
+# Returns the number of rows converted (0 if the file was already JSON).
+def migrate_patients(path=None):
+    path = path or data_store.patients_path()
+    if not is_legacy(path):
+        return 0
+    frame = pd.read_csv(path)
+    write_patients(frame, path)
+    return len(frame)
+
+# Decode throughput of the legacy and JSON encodings on `rows` synthetic rows
+def benchmark_decode(rows=100000, path=None):
+    sample = pd.read_csv(path or data_store.patients_path())
+    legacy = pd.concat([sample] * (rows // len(sample) + 1), ignore_index=True).iloc[:rows]
+    if not is_legacy(path):
+        legacy = legacy.copy()
+        for field in NESTED_FIELDS:
+            legacy[field] = [repr(value) for value in decode_column(legacy[field], field)]
+    encoded = encode_nested(legacy)
+
+    results = {}
+    for name, frame, decode in [
+        ('legacy (per-cell literal_eval)', legacy,
+         lambda values, field: [(parse_dict_string if field in DICT_FIELDS else parse_list_string)(v) for v in values]),
+        ('json (bulk)', encoded, decode_column),
+    ]:
+        start = time.perf_counter()
+        for field in NESTED_FIELDS:
+            decode(frame[field], field)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed
+        print(f"{name:32s} {elapsed:7.3f}s  {rows * len(NESTED_FIELDS) / elapsed:12,.0f} cells/s")
+    return results
+
+
+class PatientIndex:
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+        self.ids = self.frame['id'].astype(str).tolist()
+        self.positions = {patient_id: i for i, patient_id in enumerate(self.ids)}
+        self.labels = (self.frame['id'].astype(str) + ' - ' + self.frame['full_name'].astype(str)).tolist()
+        self._records = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, patient_id):
+        return patient_id in self.positions
+
+    # "ID - Name" label for a patient
+    def label(self, patient_id):
+        return self.labels[self.positions[patient_id]]
+
+    # Fully decoded record for a patient (None if unknown). Only this patient's
+    # nested fields are decoded; decode_column is for bulk callers.
+    def get(self, patient_id):
+        record = self._records.get(patient_id)
+        if record is None:
+            position = self.positions.get(patient_id)
+            if position is None:
+                return None
+            record = self.frame.iloc[position].to_dict()
+            for field in NESTED_FIELDS:
+                if field in record:
+                    record[field] = decode_value(record[field], field)
+            self._records[patient_id] = record
+        return record
+
+
+# Patient index for the current roster (rebuilt only when the roster changes)
+def load_patient_index():
+    if not data_store.table_exists('patients'):
+        return None
+    return data_store.load_table('patients', build=PatientIndex, kind='patient_index')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Patient roster encoding tools")
+    parser.add_argument("command", choices=['migrate', 'benchmark'])
+    parser.add_argument("--path", default=None, help="patients CSV (default: data/patients.csv)")
+    parser.add_argument("--rows", type=int, default=100000, help="rows for the decode benchmark")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        print(f"Converted {migrate_patients(args.path)} rows to JSON nested fields")
+    else:
+        benchmark_decode(args.rows, args.path)
@@ -0,0 +1,142 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import patient_index
+
+# Search over the patient roster for the sidebar picker.
+#
+# Every patient is indexed by ID, full name, physician name and conditions.
+# Each field keeps a lowercased text column (for substring matches) and all of
+# its words go into one sorted token array (for prefix matches by binary
+# search). A query matches a patient when every query term occurs in one of the
+# fields; results are ranked by where the terms matched and returned a page at a
+# time, so only a handful of options are ever sent to the browser.
+
+# Indexed fields, most specific first (earlier fields rank higher)
+SEARCH_FIELDS = ['id', 'full_name', 'physician', 'conditions']
+
+PAGE_SIZE = 20
+
+# Recent queries kept per index (paging through results reuses the ranking)
+MAX_CACHED_QUERIES = 64
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Physician name inside the encoded physician field (Python-literal or JSON)
+PHYSICIAN_NAME = r"""["']name["']\s*:\s*["']([^"']*)["']"""
+
+
+# Lowercased searchable text for each field of the patients frame
+def field_texts(frame):
+    texts = {
+        'id': frame['id'].astype(str),
+        'full_name': frame['full_name'].astype(str),
+        'physician': frame['physician'].astype(str).str.extract(PHYSICIAN_NAME, expand=False).fillna(''),
+        # Conditions are only ever searched as words, so the list encoding is dropped
+        'conditions': frame['conditions'].astype(str).str.replace(r"[\[\]\"']", '', regex=True),
+    }
+    return {field: text.str.lower().to_numpy(dtype=object) for field, text in texts.items()}
+
+# Words of a query (or of any text) as lowercase tokens
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+class PatientSearch:
+    def __init__(self, index):
+        self.index = index
+        self.ids = np.asarray(index.ids, dtype=object)
+        self.texts = field_texts(index.frame)
+
+        # (token, patient, field) postings, one per distinct word of each field
+        postings = []
+        for rank, field in enumerate(SEARCH_FIELDS):
+            words = pd.Series(self.texts[field]).str.findall(TOKEN_PATTERN).explode().dropna()
+            postings.append(pd.DataFrame({'token': words.to_numpy(dtype=str), 'owner': words.index, 'field': rank}))
+        postings = pd.concat(postings, ignore_index=True).drop_duplicates().sort_values('token', kind='stable')
+
+        self.tokens = postings['token'].to_numpy(dtype=str)
+        self.owners = postings['owner'].to_numpy(dtype=np.int64)
+        self.fields = postings['field'].to_numpy(dtype=np.int64)
+
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Best (lowest) field rank at which each patient has a word starting with `term`
+    def _prefix_ranks(self, term):
+        lo = np.searchsorted(self.tokens, term, side='left')
+        hi = np.searchsorted(self.tokens, term + '\uffff', side='left')
+        ranks = np.full(len(self.ids), len(SEARCH_FIELDS), dtype=np.int64)
+        np.minimum.at(ranks, self.owners[lo:hi], self.fields[lo:hi])
+        return ranks
+
+    # Match cost of one term for every patient (-1 when the term does not match).
+    # An exact ID costs 0, a word-prefix match in field f costs 2f + 1 and a
+    # plain substring match 2f + 2.
+    def _term_costs(self, term):
+        prefix = self._prefix_ranks(term)
+        costs = np.where(prefix < len(SEARCH_FIELDS), 2 * prefix + 1, -1)
+        for rank, field in enumerate(SEARCH_FIELDS):
+            unmatched = np.flatnonzero(costs < 0)
+            if not len(unmatched):
+                break
+            contains = pd.Series(self.texts[field][unmatched]).str.contains(term, regex=False).to_numpy()
+            costs[unmatched[contains]] = 2 * rank + 2
+        costs[self.texts['id'] == term] = 0
+        return costs
+
+    # Row positions of all patients matching `query`, best matches first
+    def _ranked(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return np.arange(len(self.ids))
+
+        total = np.zeros(len(self.ids), dtype=np.int64)
+        matched = np.ones(len(self.ids), dtype=bool)
+        for term in terms:
+            costs = self._term_costs(term)
+            matched &= costs >= 0
+            total += np.maximum(costs, 0)
+
+        positions = np.flatnonzero(matched)
+        return positions[np.argsort(total[positions], kind='stable')]
+
+    # Ranked positions for a query, memoized for the most recent queries
+    def matches(self, query):
+        key = ' '.join(tokenize(query))
+        with self._lock:
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                return self._queries[key]
+        positions = self._ranked(key)
+        with self._lock:
+            self._queries[key] = positions
+            while len(self._queries) > MAX_CACHED_QUERIES:
+                self._queries.popitem(last=False)
+        return positions
+
+    # One page of matching patient IDs and the total number of matches
+    def search(self, query, page=0, page_size=PAGE_SIZE):
+        positions = self.matches(query)
+        start = max(0, page) * page_size
+        return self.ids[positions[start:start + page_size]].tolist(), len(positions)
+
+
+# Number of pages needed for `total` results
+def page_count(total, page_size=PAGE_SIZE):
+    return max(1, -(-total // page_size))
+
+# Search index for the current roster (rebuilt only when the roster changes)
+def load_patient_search():
+    index = patient_index.load_patient_index()
+    if index is None:
+        return None
+    return data_store.load_derived('patients', None, lambda: PatientSearch(index), kind='patient_search')
@@ -0,0 +1,524 @@
+import os
+import re
+import glob
+import json
+import time
+import shutil
+import logging
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_store
+from patient_search import tokenize, TOKEN_PATTERN
+
+# Full-text search over every patient's medical reports.
+#
+# The index lives on disk under data/search_index. Each reports_*.csv is
+# indexed into its own segment (a positional inverted index of its reports),
+# rebuilt only when that file's mtime/size changes. Segments are merged into
+# tiers stored as flat .npy arrays that queries memory-map:
+#  - vocabulary: sorted terms, with offsets into the postings
+#  - postings: (document, term frequency) sorted by term then document, each
+#    with offsets into the token positions
+#  - documents: report id, patient id, date and length, grouped by patient so
+#    a patient's reports are one contiguous document range
+# A term lookup is a binary search in the vocabulary and BM25 scoring runs over
+# the posting slices with NumPy. Phrases ("...") are matched on positions.
+#
+# The main tier holds every patient as of the last full merge. Patients whose
+# reports changed since then are merged into a small delta tier, which hides
+# their documents in the main tier; only once the delta outgrows MERGE_FRACTION
+# of the main tier is everything merged again. Queries never wait for an
+# update: the reports files are checked for changes at most every
+# REFRESH_SECONDS, on a background thread, and a query serves the tiers of the
+# last manifest written.
+
+# Index directory, inside the data directory it covers
+INDEX_NAME = 'search_index'
+
+# Indexed report fields; positions of consecutive fields are separated so
+# that a phrase never matches across two fields
+FIELDS = ['content', 'summary', 'nlp_summary', 'specialist']
+FIELD_GAP = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+RESULT_LIMIT = 20
+
+# Size of the delta tier (in documents, relative to the main tier) above which
+# an update merges every segment into a new main tier
+MERGE_FRACTION = 0.1
+
+# Seconds between background checks of the reports files for changes
+REFRESH_SECONDS = 5.0
+
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+logger = logging.getLogger(__name__)
+
+_update_lock = threading.Lock()
+
+# index_dir -> (time of the last check, thread running it)
+_refreshes = {}
+_refreshes_lock = threading.Lock()
+
+
+def _segments_dir(index_dir):
+    return os.path.join(index_dir, 'segments')
+
+def _segment_path(index_dir, patient_id):
+    return os.path.join(_segments_dir(index_dir), f'{patient_id}.npz')
+
+def _manifest_path(index_dir):
+    return os.path.join(index_dir, 'manifest.json')
+
+
+# Positional postings of one reports frame (a segment)
+def build_segment(frame):
+    tokens, docs, positions = [], [], []
+    offsets = np.zeros(len(frame), dtype=np.int64)
+    for field in FIELDS:
+        if field not in frame.columns:
+            continue
+        words = frame[field].fillna('').astype(str).str.lower().str.findall(TOKEN_PATTERN)
+        counts = words.str.len().to_numpy(dtype=np.int64)
+        flat = words.explode().dropna()
+        doc = np.repeat(np.arange(len(frame)), counts)
+        # Position of every word within its document, continuing after earlier fields
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        position = np.arange(len(doc)) - np.repeat(starts, counts) + offsets[doc]
+        tokens.append(flat.to_numpy(dtype=str))
+        docs.append(doc)
+        positions.append(position)
+        offsets += counts + FIELD_GAP
+
+    tokens = np.concatenate(tokens) if tokens else np.empty(0, dtype=str)
+    docs = np.concatenate(docs) if docs else np.empty(0, dtype=np.int64)
+    positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+
+    terms, term_ids = np.unique(tokens, return_inverse=True)
+    order = np.lexsort((positions, docs, term_ids))
+    term_ids, docs, positions = term_ids[order], docs[order], positions[order]
+
+    # One posting per (term, document) run of positions
+    boundary = np.ones(len(docs), dtype=bool)
+    boundary[1:] = (term_ids[1:] != term_ids[:-1]) | (docs[1:] != docs[:-1])
+    posting_starts = np.flatnonzero(boundary)
+    tf = np.diff(np.append(posting_starts, len(docs)))
+
+    return {
+        'terms': terms,
+        'term_counts': np.bincount(term_ids[posting_starts], minlength=len(terms)),
+        'post_docs': docs[posting_starts].astype(np.int32),
+        'post_tf': tf.astype(np.int32),
+        'positions': positions.astype(np.int32),
+        'doc_ids': frame['id'].astype(str).to_numpy(dtype=str),
+        'doc_dates': frame['date'].astype(str).to_numpy(dtype=str),
+        'doc_len': np.maximum(offsets - FIELD_GAP * len([f for f in FIELDS if f in frame.columns]), 0).astype(np.int32),
+    }
+
+# Merge segments (in the given order) into one index
+def merge_segments(segments, patient_ids):
+    vocabulary = np.unique(np.concatenate([s['terms'] for s in segments])) if segments else np.empty(0, dtype=str)
+
+    term_ids, docs, tf, position_starts = [], [], [], []
+    doc_base = position_base = 0
+    for segment in segments:
+        mapped = np.searchsorted(vocabulary, segment['terms']).astype(np.int32)
+        term_ids.append(np.repeat(mapped, segment['term_counts']))
+        docs.append(segment['post_docs'].astype(np.int64) + doc_base)
+        tf.append(segment['post_tf'])
+        starts = np.concatenate(([0], np.cumsum(segment['post_tf'])[:-1])).astype(np.int64)
+        position_starts.append(starts + position_base)
+        doc_base += len(segment['doc_ids'])
+        position_base += len(segment['positions'])
+
+    def joined(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+    term_ids = joined(term_ids, np.int32)
+    docs = joined(docs, np.int32)
+    tf = joined(tf, np.int32)
+    position_starts = joined(position_starts, np.int64)
+    all_positions = joined([s['positions'] for s in segments], np.int32)
+
+    # Segments are concatenated in document order, so a stable sort by term
+    # leaves every term's postings sorted by document
+    order = np.argsort(term_ids, kind='stable')
+    term_ids, docs, tf, position_starts = term_ids[order], docs[order], tf[order], position_starts[order]
+
+    # Regroup the positions in the new posting order
+    post_offsets = np.concatenate(([0], np.cumsum(tf, dtype=np.int64)))
+    gather = np.repeat(position_starts - post_offsets[:-1], tf) + np.arange(post_offsets[-1])
+    positions = all_positions[gather]
+
+    doc_patients = np.concatenate([np.full(len(s['doc_ids']), pid) for s, pid in zip(segments, patient_ids)]) \
+        if segments else np.empty(0, dtype=str)
+
+    return {
+        'vocabulary': vocabulary,
+        'term_offsets': np.searchsorted(term_ids, np.arange(len(vocabulary) + 1)).astype(np.int64),
+        'post_docs': docs,
+        'post_tf': tf,
+        'post_offsets': post_offsets,
+        'positions': positions,
+        'doc_ids': joined([s['doc_ids'] for s in segments], str),
+        'doc_patients': doc_patients.astype(str),
+        'doc_dates': joined([s['doc_dates'] for s in segments], str),
+        'doc_len': joined([s['doc_len'] for s in segments], np.int32),
+    }
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+# Manifest of the index: indexed source signatures, the generation counter and
+# the main and delta tiers ({'dir', 'patients': {id: [lo, hi]}, 'documents'})
+def _read_manifest(index_dir):
+    try:
+        with open(_manifest_path(index_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+
+# {patient_id: signature} of every patient's reports: the file's mtime/size,
+# or the table revision with the SQLite backend
+def _sources(data_dir):
+    if data_store.BACKEND == 'sqlite':
+        import sqlite_store
+        return {pid: [version] for pid, version in sorted(sqlite_store.versions('reports').items())}
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, 'reports_*.csv'))):
+        patient_id = os.path.basename(path)[len('reports_'):-len('.csv')]
+        sources[patient_id] = _signature(path)
+    return sources
+
+def _read_reports(data_dir, patient_id):
+    if data_store.BACKEND == 'sqlite':
+        return data_store.read_table('reports', patient_id)
+    return pd.read_csv(os.path.join(data_dir, f'reports_{patient_id}.csv'))
+
+def _load_segments(index_dir, patient_ids):
+    segments = []
+    for patient_id in patient_ids:
+        with np.load(_segment_path(index_dir, patient_id)) as segment:
+            segments.append({key: segment[key] for key in segment.files})
+    return segments
+
+# Merge segments into a new tier directory and describe it for the manifest
+def _write_tier(index_dir, name, segments, patient_ids):
+    merged = merge_segments(segments, patient_ids)
+    staging = os.path.join(index_dir, name + '.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for key, array in merged.items():
+        np.save(os.path.join(staging, f'{key}.npy'), array)
+    os.replace(staging, os.path.join(index_dir, name))
+
+    ranges, start = {}, 0
+    for patient_id, segment in zip(patient_ids, segments):
+        ranges[patient_id] = [start, start + len(segment['doc_ids'])]
+        start += len(segment['doc_ids'])
+    return {'dir': name, 'patients': ranges, 'documents': start}
+
+def _tier_dirs(manifest):
+    return {tier['dir'] for tier in (manifest.get('main'), manifest.get('delta')) if tier}
+
+# Bring the on-disk index in line with the reports files in data_dir.
+# Only files added or changed since the last update are re-indexed, and only
+# into the delta tier unless it has grown too large (or `merge` is set).
+# Returns the number of segments rebuilt or removed (0 if nothing changed).
+def update_index(data_dir=data_store.DATA_DIR, index_dir=None, merge=False):
+    index_dir = index_dir or os.path.join(data_dir, INDEX_NAME)
+    with _update_lock:
+        previous = _read_manifest(index_dir)
+        os.makedirs(_segments_dir(index_dir), exist_ok=True)
+
+        current = _sources(data_dir)
+
+        changed = [pid for pid, sig in current.items() if previous['files'].get(pid) != sig]
+        removed = [pid for pid in previous['files'] if pid not in current]
+        main, delta = previous.get('main'), previous.get('delta')
+        if not changed and not removed and main is not None and not (merge and delta):
+            return 0
+
+        for patient_id in changed:
+            segment = build_segment(_read_reports(data_dir, patient_id))
+            np.savez(_segment_path(index_dir, patient_id), **segment)
+        for patient_id in removed:
+            if os.path.exists(_segment_path(index_dir, patient_id)):
+                os.remove(_segment_path(index_dir, patient_id))
+
+        generation = previous.get('generation', 0) + 1
+        delta_ids = sorted((set(delta['patients'] if delta else ()) | set(changed)) & set(current))
+        delta_segments = None
+        if main is not None and not merge:
+            delta_segments = _load_segments(index_dir, delta_ids)
+            if sum(len(segment['doc_ids']) for segment in delta_segments) > MERGE_FRACTION * main['documents']:
+                delta_segments = None
+
+        if delta_segments is None:
+            patient_ids = sorted(current)
+            main = _write_tier(index_dir, f'main-{generation}', _load_segments(index_dir, patient_ids), patient_ids)
+            delta = None
+        else:
+            delta = _write_tier(index_dir, f'delta-{generation}', delta_segments, delta_ids) if delta_ids else None
+
+        manifest = {'files': current, 'generation': generation, 'main': main, 'delta': delta}
+        with open(_manifest_path(index_dir) + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(_manifest_path(index_dir) + '.tmp', _manifest_path(index_dir))
+        data_store.invalidate(_manifest_path(index_dir))
+
+        # Tiers of the previous manifest stay for queries still loading them
+        keep = _tier_dirs(manifest) | _tier_dirs(previous) | {'segments'}
+        for name in os.listdir(index_dir):
+            if name not in keep and os.path.isdir(os.path.join(index_dir, name)):
+                shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+        return len(changed) + len(removed)
+
+
+# Mask of the values present in `sorted_values` (a sorted array)
+def _contains(sorted_values, values):
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    found = np.searchsorted(sorted_values, values)
+    return sorted_values[np.minimum(found, len(sorted_values) - 1)] == values
+
+# Split a query into quoted phrases and the remaining loose terms
+def parse_query(query):
+    phrases = [tokenize(p) for p in PHRASE_PATTERN.findall(query)]
+    loose = tokenize(PHRASE_PATTERN.sub(' ', query))
+    return [p for p in phrases if p], loose
+
+
+# One merged set of segments. Documents of `hidden` patients (changed or
+# removed since the tier was written) are left out of every result.
+class IndexTier:
+    def __init__(self, directory, patients, hidden=()):
+        self.arrays = {name[:-len('.npy')]: np.load(os.path.join(directory, name), mmap_mode='r')
+                       for name in os.listdir(directory) if name.endswith('.npy')}
+        self.vocabulary = self.arrays['vocabulary']
+        self.term_offsets = self.arrays['term_offsets']
+        self.doc_len = np.asarray(self.arrays['doc_len'], dtype=float)
+        self.patients = {pid: bounds for pid, bounds in patients.items() if pid not in hidden}
+        self.visible = None
+        if len(self.patients) < len(patients):
+            self.visible = np.zeros(len(self.doc_len), dtype=bool)
+            for lo, hi in self.patients.values():
+                self.visible[lo:hi] = True
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    # Document range [lo, hi) of a patient, or of the whole tier
+    def bounds(self, patient_id=None):
+        if patient_id is None:
+            return 0, len(self)
+        return self.patients.get(patient_id, (0, 0))
+
+    # Number and total length of the documents that are not hidden
+    def visible_stats(self):
+        if self.visible is None:
+            return len(self), self.doc_len.sum()
+        return int(self.visible.sum()), self.doc_len[self.visible].sum()
+
+    # Posting slice [i, j) of a term, limited to the documents in [lo, hi)
+    def _postings(self, term, lo, hi):
+        t = int(np.searchsorted(self.vocabulary, term))
+        if t >= len(self.vocabulary) or self.vocabulary[t] != term:
+            return 0, 0, 0
+        start, stop = int(self.term_offsets[t]), int(self.term_offsets[t + 1])
+        docs = self.arrays['post_docs'][start:stop]
+        i = start + int(np.searchsorted(docs, lo))
+        j = start + int(np.searchsorted(docs, hi))
+        return i, j, stop - start
+
+    # Number of documents containing a term (hidden ones included)
+    def document_frequency(self, term):
+        return self._postings(term, 0, 0)[2]
+
+    # Documents containing `phrase` (a list of terms) as consecutive words
+    def _phrase_docs(self, phrase, lo, hi):
+        spans = [self._postings(term, lo, hi) for term in phrase]
+        if any(i == j for i, j, _ in spans):
+            return np.empty(0, dtype=np.int64)
+
+        # Candidate documents hold every term; rarest terms are intersected first
+        candidates = None
+        for i, j, _ in sorted(spans, key=lambda span: span[1] - span[0]):
+            docs = np.asarray(self.arrays['post_docs'][i:j], dtype=np.int64)
+            candidates = docs if candidates is None else candidates[_contains(docs, candidates)]
+            if not len(candidates):
+                return candidates
+
+        # Key each occurrence by (document, position the phrase would start at);
+        # keys come out sorted because postings are ordered by document and position
+        keys = None
+        for offset, (i, j, _) in enumerate(spans):
+            docs = np.asarray(self.arrays['post_docs'][i:j], dtype=np.int64)
+            picked = np.flatnonzero(_contains(candidates, docs))
+            tf = np.asarray(self.arrays['post_tf'][i:j], dtype=np.int64)[picked]
+            starts = np.asarray(self.arrays['post_offsets'][i:j], dtype=np.int64)[picked]
+            gather = np.repeat(starts - np.concatenate(([0], np.cumsum(tf)[:-1])), tf) + np.arange(int(tf.sum()))
+            positions = self.arrays['positions'][gather].astype(np.int64) - offset
+            term_keys = (np.repeat(docs[picked], tf) << 32) | np.maximum(positions, 0)
+            term_keys = term_keys[positions >= 0]
+            keys = term_keys if keys is None else keys[_contains(term_keys, keys)]
+            if not len(keys):
+                return np.empty(0, dtype=np.int64)
+        return np.unique(keys >> 32)
+
+    # BM25 scores of the visible documents in [lo, hi) for the query terms
+    # (idf and the average document length come from the whole index); every
+    # phrase must occur in a matching document. Returns (docs, scores).
+    def score(self, phrases, idf, avg_len, lo, hi):
+        required = None
+        for phrase in phrases:
+            docs = self._phrase_docs(phrase, lo, hi)
+            required = docs if required is None else np.intersect1d(required, docs, assume_unique=True)
+
+        docs_parts, score_parts = [], []
+        for term, weight in idf.items():
+            i, j, _ = self._postings(term, lo, hi)
+            if i == j:
+                continue
+            docs = self.arrays['post_docs'][i:j].astype(np.int64)
+            tf = self.arrays['post_tf'][i:j].astype(float)
+            norm = K1 * (1 - B + B * self.doc_len[docs] / avg_len)
+            docs_parts.append(docs)
+            score_parts.append(weight * tf * (K1 + 1) / (tf + norm))
+
+        if docs_parts:
+            docs, inverse = np.unique(np.concatenate(docs_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        else:
+            docs, scores = np.empty(0, dtype=np.int64), np.empty(0)
+        keep = np.ones(len(docs), dtype=bool)
+        if required is not None:
+            keep &= np.isin(docs, required)
+        if self.visible is not None:
+            keep &= self.visible[docs]
+        return docs[keep], scores[keep]
+
+
+class ReportSearchIndex:
+    def __init__(self, index_dir):
+        manifest = _read_manifest(index_dir)
+        main, delta = manifest.get('main'), manifest.get('delta')
+        self.tiers = []
+        if main is not None:
+            # Patients re-indexed into the delta tier, or removed, are hidden in the main tier
+            hidden = set(main['patients']) - (set(manifest['files']) - set(delta['patients'] if delta else ()))
+            self.tiers.append(IndexTier(os.path.join(index_dir, main['dir']), main['patients'], hidden))
+        if delta is not None:
+            self.tiers.append(IndexTier(os.path.join(index_dir, delta['dir']), delta['patients']))
+
+        stats = [tier.visible_stats() for tier in self.tiers]
+        self.size = sum(count for count, _ in stats)
+        self.avg_len = sum(length for _, length in stats) / self.size if self.size else 0.0
+
+    def __len__(self):
+        return self.size
+
+    # Ranked reports for `query`, optionally limited to one patient. Loose terms
+    # are scored with BM25; every quoted phrase must occur in a matching report.
+    # Document frequencies count hidden documents until the next full merge.
+    def search(self, query, patient_id=None, limit=RESULT_LIMIT):
+        phrases, loose = parse_query(query)
+        idf = {}
+        for term in set(loose + [term for phrase in phrases for term in phrase]):
+            df = sum(tier.document_frequency(term) for tier in self.tiers)
+            if df:
+                idf[term] = np.log(1 + max(len(self) - df + 0.5, 0.5) / (df + 0.5))
+
+        tier_parts, docs_parts, score_parts = [], [], []
+        for number, tier in enumerate(self.tiers):
+            lo, hi = tier.bounds(patient_id)
+            if lo == hi:
+                continue
+            docs, scores = tier.score(phrases, idf, self.avg_len, lo, hi)
+            tier_parts.append(np.full(len(docs), number))
+            docs_parts.append(docs)
+            score_parts.append(scores)
+
+        if docs_parts:
+            tiers, docs, scores = np.concatenate(tier_parts), np.concatenate(docs_parts), np.concatenate(score_parts)
+        else:
+            tiers, docs, scores = np.empty(0, dtype=int), np.empty(0, dtype=np.int64), np.empty(0)
+
+        if len(docs) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            tiers, docs, scores = tiers[top], docs[top], scores[top]
+        order = np.lexsort((docs, tiers, -scores))
+        tiers, docs, scores = tiers[order], docs[order], scores[order]
+
+        def column(name):
+            values = [self.tiers[t].arrays[name][d] for t, d in zip(tiers, docs)]
+            return np.array(values, dtype=str) if values else np.empty(0, dtype=str)
+
+        return pd.DataFrame({
+            'report_id': column('doc_ids'),
+            'patient_id': column('doc_patients'),
+            'date': column('doc_dates'),
+            'score': scores.round(3),
+        })
+
+
+def _refresh(data_dir, index_dir):
+    try:
+        update_index(data_dir, index_dir)
+    except Exception:
+        logger.exception('Updating the report search index in %s failed', index_dir)
+
+# Check the reports files for changes on a background thread, unless a check
+# ran less than REFRESH_SECONDS ago or is still running. Returns the thread
+# started, or None.
+def refresh_in_background(data_dir=data_store.DATA_DIR, index_dir=None):
+    index_dir = index_dir or os.path.join(data_dir, INDEX_NAME)
+    now = time.monotonic()
+    with _refreshes_lock:
+        checked, thread = _refreshes.get(index_dir, (None, None))
+        if (thread is not None and thread.is_alive()) or (checked is not None and now - checked < REFRESH_SECONDS):
+            return None
+        thread = threading.Thread(target=_refresh, args=(data_dir, index_dir), name='report-index-refresh', daemon=True)
+        _refreshes[index_dir] = (now, thread)
+    thread.start()
+    return thread
+
+# Search index over the reports as of the last update. Changes are picked up
+# by a background refresh; only the very first build runs in the caller.
+def load_index(data_dir=data_store.DATA_DIR):
+    index_dir = os.path.join(data_dir, INDEX_NAME)
+    manifest = _manifest_path(index_dir)
+    if os.path.exists(manifest):
+        refresh_in_background(data_dir, index_dir)
+        index = data_store.cached_load(manifest, lambda p: ReportSearchIndex(index_dir), kind='report_search')
+        if index.tiers:
+            return index
+    # No index yet (or one written in an older layout)
+    update_index(data_dir, index_dir)
+    return data_store.cached_load(manifest, lambda p: ReportSearchIndex(index_dir), kind='report_search')
+
+# Ranked reports for a query across all patients, or within one patient
+def search(query, patient_id=None, limit=RESULT_LIMIT):
+    return load_index().search(query, patient_id, limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over medical reports")
+    parser.add_argument("query", nargs='?', default=None, help='search terms; quote phrases with "..."')
+    parser.add_argument("--patient", default=None, help="only search this patient's reports")
+    parser.add_argument("--limit", type=int, default=RESULT_LIMIT)
+    parser.add_argument("--merge", action='store_true', help="merge the delta tier into the main tier")
+    args = parser.parse_args()
+
+    print(f"Index updated ({update_index(merge=args.merge)} segments rebuilt)")
+    if args.query:
+        print(search(args.query, args.patient, args.limit).to_string(index=False))
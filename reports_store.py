@@ -0,0 +1,55 @@
+import numpy as np
+
+import data_store
+
+# Paged access to a patient's medical reports.
+#
+# Reports are ordered newest first (by date, then id) and paged with a cursor:
+# the sort key of the last report shown. The next page is found by binary
+# search on the sorted keys, so paging stays O(log n + page) however far into
+# the history the user goes, and reports added in the meantime never shift the
+# pages that come after the cursor. Listings only carry the header columns; a
+# report's body is looked up by id when it is opened.
+
+PAGE_SIZE = 10
+PAGE_SIZES = [5, 10, 25, 50]
+
+HEADER_COLUMNS = ['id', 'date', 'source', 'report_type', 'specialist']
+
+
+class ReportIndex:
+    def __init__(self, frame):
+        keys = frame['date'].astype(str) + '\x00' + frame['id'].astype(str)
+        order = np.argsort(keys.to_numpy(dtype=str), kind='stable')
+        # Stored oldest first; pages are read backwards from the cursor
+        self.frame = frame.iloc[order].reset_index(drop=True)
+        self.keys = keys.to_numpy(dtype=str)[order]
+        self.positions = {report_id: i for i, report_id in enumerate(self.frame['id'].astype(str))}
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Up to `page_size` reports older than `cursor` (newest first), restricted to
+    # the rows where `mask` is True. Returns the header rows and the cursor of
+    # the next page (None when this is the last page).
+    def page(self, cursor=None, page_size=PAGE_SIZE, mask=None):
+        end = len(self.keys) if cursor is None else int(np.searchsorted(self.keys, cursor, side='left'))
+        candidates = np.arange(end) if mask is None else np.flatnonzero(np.asarray(mask)[:end])
+        picked = candidates[::-1][:page_size]
+        rows = self.frame.iloc[picked][[c for c in HEADER_COLUMNS if c in self.frame.columns]]
+        more = len(candidates) > page_size
+        return rows, (self.keys[picked[-1]] if more else None)
+
+    # Full record of one report (None if unknown)
+    def get(self, report_id):
+        position = self.positions.get(str(report_id))
+        if position is None:
+            return None
+        return self.frame.iloc[position].to_dict()
+
+
+# Report index for a patient (None if the patient has no reports)
+def load_reports(patient_id):
+    if not data_store.table_exists('reports', patient_id):
+        return None
+    return data_store.load_table('reports', patient_id, ReportIndex, kind='report_index')
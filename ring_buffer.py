@@ -0,0 +1,83 @@
+import numpy as np
+
+# Fixed-size, column-per-vital ring buffer for live readings.
+#
+# Storage is preallocated once: one datetime64 array for timestamps and one
+# contiguous float row per column. Pushing a sample is O(1) regardless of the
+# window size and memory use never grows; the chart reads the window back in
+# chronological order with at most two slice copies.
+
+class RingBuffer:
+    def __init__(self, capacity, columns):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = int(capacity)
+        self.columns = list(columns)
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self.times = np.empty(self.capacity, dtype='datetime64[ms]')
+        self.values = np.full((len(self.columns), self.capacity), np.nan)
+        self.head = 0   # next write position
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    # Append one sample; values are given in column order
+    def push(self, timestamp, values):
+        self.times[self.head] = np.datetime64(timestamp, 'ms')
+        self.values[:, self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    # Append one reading dict (missing columns are stored as NaN)
+    def push_reading(self, timestamp, reading):
+        self.push(timestamp, [reading.get(name, np.nan) for name in self.columns])
+
+    # Append many samples at once; only the last `capacity` of them are kept
+    def extend(self, timestamps, values):
+        timestamps = np.asarray(timestamps, dtype='datetime64[ms]')
+        values = np.asarray(values, dtype=float).reshape(len(self.columns), -1)
+        n = len(timestamps)
+        if n > self.capacity:
+            timestamps, values, n = timestamps[-self.capacity:], values[:, -self.capacity:], self.capacity
+
+        first = min(n, self.capacity - self.head)
+        self.times[self.head:self.head + first] = timestamps[:first]
+        self.values[:, self.head:self.head + first] = values[:, :first]
+        rest = n - first
+        if rest:
+            self.times[:rest] = timestamps[first:]
+            self.values[:, :rest] = values[:, first:]
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+
+    # Chronological copy of the window: (times, values[column, sample])
+    def view(self):
+        if self.size < self.capacity:
+            return self.times[:self.size].copy(), self.values[:, :self.size].copy()
+        times = np.concatenate((self.times[self.head:], self.times[:self.head]))
+        values = np.concatenate((self.values[:, self.head:], self.values[:, :self.head]), axis=1)
+        return times, values
+
+    # Chronological copy of a single column
+    def column(self, name):
+        row = self.values[self._column_index[name]]
+        if self.size < self.capacity:
+            return row[:self.size].copy()
+        return np.concatenate((row[self.head:], row[:self.head]))
+
+    # Most recent sample as (timestamp, {column: value}), or None when empty
+    def latest(self):
+        if not self.size:
+            return None
+        i = (self.head - 1) % self.capacity
+        return self.times[i], {name: self.values[j, i] for j, name in enumerate(self.columns)}
+
+    # New buffer with a different capacity holding the most recent samples
+    def resized(self, capacity):
+        buffer = RingBuffer(capacity, self.columns)
+        times, values = self.view()
+        if len(times):
+            buffer.extend(times, values)
+        return buffer
@@ -0,0 +1,326 @@
+import os
+import glob
+import queue
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+import data_store
+
+# Optional SQLite storage backend (enabled with DASHBOARD_BACKEND=sqlite).
+#
+# Patients, vitals, reports, comments and condition events live in a single
+# database file instead of about five CSV files per patient. Tables keep the
+# CSV column names, so every reader gets back exactly the frame it used to read
+# from a file. The database runs in WAL mode (readers never block the writer),
+# per-patient tables are indexed on (patient_id, timestamp/date), and each
+# process keeps a small pool of connections that is rebuilt after a fork.
+#
+# Every write bumps a per-(table, patient) revision in the same transaction;
+# data_store uses the revision in place of a file's mtime/size to validate its
+# cache, so unchanged tables are never read twice.
+
+VITALS = ['heart_rate', 'blood_pressure_systolic', 'blood_pressure_diastolic', 'temperature',
+          'respiratory_rate', 'oxygen_saturation', 'glucose']
+
+# Columns of each table, in CSV order, with their SQLite types
+TABLES = {
+    'patients': [('id', 'TEXT PRIMARY KEY'), ('first_name', 'TEXT'), ('last_name', 'TEXT'), ('full_name', 'TEXT'),
+                 ('age', 'INTEGER'), ('gender', 'TEXT'), ('blood_type', 'TEXT'), ('height', 'REAL'),
+                 ('weight', 'REAL'), ('conditions', 'TEXT'), ('medications', 'TEXT'), ('allergies', 'TEXT'),
+                 ('emergency_contact', 'TEXT'), ('physician', 'TEXT'), ('insurance', 'TEXT'),
+                 ('last_visit', 'TEXT'), ('next_appointment', 'TEXT')],
+    'vitals': [('patient_id', 'TEXT NOT NULL'), ('timestamp', 'TEXT NOT NULL')]
+              + [(vital, 'REAL' if vital == 'temperature' else 'INTEGER') for vital in VITALS],
+    'reports': [('id', 'TEXT'), ('patient_id', 'TEXT NOT NULL'), ('date', 'TEXT'), ('source', 'TEXT'),
+                ('report_type', 'TEXT'), ('summary', 'TEXT'), ('content', 'TEXT'), ('nlp_summary', 'TEXT'),
+                ('specialist', 'TEXT')],
+    'comments': [('id', 'TEXT'), ('patient_id', 'TEXT NOT NULL'), ('date', 'TEXT'), ('name', 'TEXT'),
+                 ('profession', 'TEXT'), ('comment', 'TEXT'), ('topic', 'TEXT')],
+    'condition_timeline': [('patient_id', 'TEXT NOT NULL'), ('date', 'TEXT'), ('event_type', 'TEXT'),
+                           ('description', 'TEXT'), ('condition', 'TEXT'), ('severity', 'TEXT'),
+                           ('healthcare_provider', 'TEXT')],
+}
+
+# Per-patient tables and the column their rows are ordered and indexed by
+ORDER_COLUMNS = {
+    'vitals': 'timestamp',
+    'reports': 'date',
+    'comments': 'date',
+    'condition_timeline': 'date',
+}
+
+# Tables whose CSV files have no patient_id column (it is implied by the file name)
+IMPLIED_PATIENT = {'condition_timeline'}
+
+# Connections kept per process
+POOL_SIZE = 4
+
+# Seconds a writer waits for another writer's transaction
+BUSY_TIMEOUT = 30
+
+# Seconds between checks for a freed slot while every connection is in use
+SLOT_WAIT = 0.5
+
+
+def _schema():
+    statements = []
+    for table, columns in TABLES.items():
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{name} {kind}' for name, kind in columns)})")
+    for table, column in ORDER_COLUMNS.items():
+        statements.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_patient ON {table} (patient_id, {column})")
+    statements.append("CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_id ON comments (patient_id, id)")
+    statements.append("CREATE TABLE IF NOT EXISTS revisions "
+                      "(tbl TEXT NOT NULL, patient_id TEXT NOT NULL, version INTEGER NOT NULL, "
+                      "PRIMARY KEY (tbl, patient_id))")
+    statements.append("CREATE TABLE IF NOT EXISTS sequences "
+                      "(name TEXT NOT NULL, patient_id TEXT NOT NULL, last_id INTEGER NOT NULL, "
+                      "PRIMARY KEY (name, patient_id))")
+    return statements
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _schema():
+            conn.execute(statement)
+        return conn
+
+    # An idle connection, a new one while the pool has free slots, or the next
+    # one returned. A slot is given back when opening its connection fails.
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    return self._connect()
+                except BaseException:
+                    self._free_slot()
+                    raise
+            try:
+                return self._idle.get(timeout=SLOT_WAIT)
+            except queue.Empty:
+                # Look again: a discarded connection may have freed a slot
+                continue
+
+    def _free_slot(self):
+        with self._lock:
+            self._created -= 1
+
+    # Put a connection back. One left inside a transaction is rolled back first,
+    # and closed (freeing its slot) if even that fails.
+    def _release(self, conn):
+        if conn.in_transaction:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                conn.close()
+                self._free_slot()
+                return
+        self._idle.put(conn)
+
+    # A pooled connection (autocommit mode; use transaction() for writes)
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Connection pool of this process for a database file (connections are never
+# shared with a forked child: the child gets a pool of its own)
+def get_pool(path=None):
+    path = os.path.abspath(path or data_store.SQLITE_PATH)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+# Write transaction on a pooled connection (BEGIN IMMEDIATE takes the write lock up front)
+@contextmanager
+def transaction(path=None):
+    with get_pool(path).connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # SQLite may already have rolled back (e.g. after a failed COMMIT)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+def _patient_key(patient_id):
+    return '' if patient_id is None else str(patient_id)
+
+def _bump(conn, table, patient_id):
+    conn.execute("INSERT INTO revisions (tbl, patient_id, version) VALUES (?, ?, 1) "
+                 "ON CONFLICT (tbl, patient_id) DO UPDATE SET version = version + 1",
+                 (table, _patient_key(patient_id)))
+
+# Revision of a table (of one patient's rows for per-patient tables); 0 if never written
+def version(table, patient_id=None, path=None):
+    with get_pool(path).connection() as conn:
+        row = conn.execute("SELECT version FROM revisions WHERE tbl = ? AND patient_id = ?",
+                           (table, _patient_key(patient_id))).fetchone()
+    return row[0] if row else 0
+
+# {patient_id: revision} for every patient with rows in a per-patient table
+def versions(table, path=None):
+    with get_pool(path).connection() as conn:
+        return dict(conn.execute("SELECT patient_id, version FROM revisions WHERE tbl = ?", (table,)).fetchall())
+
+# Rows of a table as a frame with the CSV columns (one patient's rows for per-patient tables)
+def read_table(table, patient_id=None, path=None):
+    columns = [name for name, _ in TABLES[table] if not (table in IMPLIED_PATIENT and name == 'patient_id')]
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    params = ()
+    if table in ORDER_COLUMNS:
+        query += f" WHERE patient_id = ? ORDER BY {ORDER_COLUMNS[table]}, rowid"
+        params = (patient_id,)
+    else:
+        query += " ORDER BY rowid"
+    with get_pool(path).connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+# Last `rows` rows of a patient's table, oldest first
+def read_tail(table, patient_id, rows=100, path=None):
+    column = ORDER_COLUMNS[table]
+    names = ', '.join(name for name, _ in TABLES[table])
+    query = (f"SELECT * FROM (SELECT {names}, rowid AS _row FROM {table} WHERE patient_id = ? "
+             f"ORDER BY {column} DESC, rowid DESC LIMIT ?) ORDER BY {column}, _row")
+    with get_pool(path).connection() as conn:
+        return pd.read_sql_query(query, conn, params=(patient_id, rows)).drop(columns='_row')
+
+def _insert(conn, table, frame, patient_id):
+    frame = frame.copy(deep=False)
+    if table in ORDER_COLUMNS and patient_id is not None:
+        frame['patient_id'] = patient_id
+    columns = [name for name, _ in TABLES[table] if name in frame.columns]
+    for column in columns:
+        # Timestamps are stored as text in the same format as the CSV files
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+    placeholders = ', '.join('?' * len(columns))
+    rows = frame[columns].astype(object).where(frame[columns].notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+# Replace a table's rows (one patient's rows for per-patient tables) with `frame`
+def write_table(table, frame, patient_id=None, path=None):
+    with transaction(path) as conn:
+        if table in ORDER_COLUMNS:
+            conn.execute(f"DELETE FROM {table} WHERE patient_id = ?", (patient_id,))
+        else:
+            conn.execute(f"DELETE FROM {table}")
+        _insert(conn, table, frame, patient_id)
+        _bump(conn, table, patient_id)
+
+# Append rows to a patient's table
+def append_rows(table, frame, patient_id, path=None):
+    with transaction(path) as conn:
+        _insert(conn, table, frame, patient_id)
+        _bump(conn, table, patient_id)
+
+# Append a comment (a dict without 'id') and return it with its new ID.
+# The ID comes from a per-patient sequence advanced inside the same transaction.
+def append_comment(patient_id, comment, path=None):
+    with transaction(path) as conn:
+        row = conn.execute("SELECT last_id FROM sequences WHERE name = 'comments' AND patient_id = ?",
+                           (patient_id,)).fetchone()
+        if row is None:
+            # First append: continue after the highest ID already stored
+            ids = [r[0] for r in conn.execute("SELECT id FROM comments WHERE patient_id = ?", (patient_id,))]
+            last = max((int(''.join(ch for ch in i if ch.isdigit()) or 0) for i in ids if i), default=0)
+        else:
+            last = row[0]
+        entry = dict(comment, id=f"C{last + 1:03d}", patient_id=patient_id)
+        conn.execute("INSERT INTO sequences (name, patient_id, last_id) VALUES ('comments', ?, ?) "
+                     "ON CONFLICT (name, patient_id) DO UPDATE SET last_id = excluded.last_id",
+                     (patient_id, last + 1))
+        _insert(conn, 'comments', pd.DataFrame([entry]), patient_id)
+        _bump(conn, 'comments', patient_id)
+    return entry
+
+
+# File of the CSV tree holding a table (per-patient tables take the patient id)
+CSV_PATTERNS = {
+    'vitals': 'vitals_*.csv',
+    'reports': 'reports_*.csv',
+    'comments': 'comments_*.csv',
+    'condition_timeline': 'condition_timeline_*.csv',
+}
+
+# Import an existing CSV data directory into the database.
+# Vitals are copied in chunks, so memory stays bounded for long histories.
+# Returns {table: rows imported}.
+def import_tree(data_dir=None, path=None, chunk_rows=100000):
+    data_dir = data_dir or data_store.DATA_DIR
+    counts = {table: 0 for table in TABLES}
+
+    patients_file = os.path.join(data_dir, 'patients.csv')
+    if os.path.exists(patients_file):
+        # Nested fields are stored in the JSON encoding whatever the file used
+        import patient_index
+        patients = patient_index.encode_nested(pd.read_csv(patients_file))
+        write_table('patients', patients, path=path)
+        counts['patients'] = len(patients)
+
+    for table, pattern in CSV_PATTERNS.items():
+        prefix = pattern.split('*')[0]
+        for file in sorted(glob.glob(os.path.join(data_dir, pattern))):
+            patient_id = os.path.basename(file)[len(prefix):-len('.csv')]
+            if table == 'vitals':
+                write_table(table, pd.DataFrame(columns=['patient_id']), patient_id, path)
+                for chunk in pd.read_csv(file, chunksize=chunk_rows):
+                    append_rows(table, chunk, patient_id, path)
+                    counts[table] += len(chunk)
+            else:
+                frame = pd.read_csv(file)
+                write_table(table, frame, patient_id, path)
+                counts[table] += len(frame)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite backend for the patient dashboard")
+    parser.add_argument("command", choices=['import'])
+    parser.add_argument("--data-dir", default=None, help="CSV data directory to import (default: data)")
+    parser.add_argument("--db", default=None, help=f"database file (default: {data_store.SQLITE_PATH})")
+    args = parser.parse_args()
+
+    for table, rows in import_tree(args.data_dir, args.db).items():
+        print(f"{table:20s} {rows:10d} rows")
@@ -1,15 +1,31 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import json
-import random
 import os
 import time
-import ast  # for safely evaluating strings as literals
+import uuid
+
+import comments_journal
+import condition_timeline
+import data_store
+import facets
+import figure_cache
+import html_blocks
+import downsample
+import live_stream
+import patient_index
+import patient_search
+import report_search
+import reports_store
+import vitals_alerts
+import vitals_rollups
+import vitals_sim
+import vitals_store
+from vitals_gen import generate_vital_signs
 
 # Set page configuration
 st.set_page_config(
@@ -93,6 +109,11 @@ st.markdown("""
         margin-top: 1.5rem;
         margin-bottom: 1.5rem;
     }
+    .card-grid {
+        display: grid;
+        gap: 1rem;
+        margin-bottom: 1rem;
+    }
     .comment-box {
         background-color: #f8f9fa;
         border-radius: 5px;
@@ -110,140 +131,19 @@ st.markdown("""
 
 # --- Helper Functions ---
 
-# Helper function to parse string representations of dictionaries
-def parse_dict_string(s):
-    if isinstance(s, str):
-        try:
-            # Try to parse the string as a Python literal
-            return ast.literal_eval(s)
-        except (SyntaxError, ValueError):
-            # If parsing fails, return the original string
-            return s
-    return s
-
-# Helper function to parse string representations of lists
-def parse_list_string(s):
-    if isinstance(s, str):
-        try:
-            # Try to parse the string as a Python literal
-            result = ast.literal_eval(s)
-            if isinstance(result, list):
-                return result
-            return [s]  # Return a list with the string if it's not a list
-        except (SyntaxError, ValueError):
-            # If parsing fails, return a list with the original string
-            return [s]
-    return s if isinstance(s, list) else [s]
-
-# Function to process patient data from CSV
-def process_patient_data(patient_dict):
-    # Fields that need special handling
-    dict_fields = ['emergency_contact', 'physician', 'insurance']
-    list_fields = ['conditions', 'medications', 'allergies']
-    
-    for field in dict_fields:
-        if field in patient_dict:
-            patient_dict[field] = parse_dict_string(patient_dict[field])
-    
-    for field in list_fields:
-        if field in patient_dict:
-            patient_dict[field] = parse_list_string(patient_dict[field])
-    
-    return patient_dict
+# Stable identifier for the current browser session
+def get_session_id():
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
 
 # --- Data Generation Functions ---
 
-# Generate vital signs data for a specific patient
-def generate_vital_signs(patient_id, days=30):
-    data = []
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    current_date = start_date
-    
-    # Base values
-    base_heart_rate = random.randint(65, 85)
-    base_systolic = random.randint(110, 140)
-    base_diastolic = random.randint(70, 90)
-    base_temperature = round(random.uniform(36.5, 37.3), 1)
-    base_respiratory_rate = random.randint(12, 18)
-    base_oxygen = random.randint(94, 99)
-    base_glucose = random.randint(80, 120)
-    
-    # Add some randomness to simulate daily variations and trends
-    while current_date <= end_date:
-        # Multiple readings per day
-        for hour in [8, 12, 16, 20]:
-            timestamp = current_date.replace(hour=hour, minute=random.randint(0, 59))
-            
-            # Add some random variation to the base values
-            heart_rate = max(40, min(120, base_heart_rate + random.randint(-10, 10)))
-            systolic = max(90, min(180, base_systolic + random.randint(-15, 15)))
-            diastolic = max(50, min(110, base_diastolic + random.randint(-10, 10)))
-            temperature = round(max(35.5, min(38.0, base_temperature + random.uniform(-0.4, 0.4))), 1)
-            respiratory_rate = max(10, min(25, base_respiratory_rate + random.randint(-3, 3)))
-            oxygen = max(88, min(100, base_oxygen + random.randint(-3, 3)))
-            glucose = max(60, min(200, base_glucose + random.randint(-20, 20)))
-            
-            # Add some patterns
-            if timestamp.weekday() in [5, 6]:  # Weekend
-                heart_rate += random.randint(0, 5)  # More activity on weekends
-            
-            if 12 <= timestamp.hour <= 14:  # After lunch
-                glucose += random.randint(10, 30)
-            
-            data.append({
-                'patient_id': patient_id,
-                'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                'heart_rate': heart_rate,
-                'blood_pressure_systolic': systolic,
-                'blood_pressure_diastolic': diastolic,
-                'temperature': temperature,
-                'respiratory_rate': respiratory_rate,
-                'oxygen_saturation': oxygen,
-                'glucose': glucose
-            })
-        
-        # Next day
-        current_date += timedelta(days=1)
-    
-    # Save to CSV
-    pd.DataFrame(data).to_csv(f'data/vitals_{patient_id}.csv', index=False)
-    return data
-
 # Function to simulate live data stream
-def simulate_live_data(patient_id):
-    # Base values (personalized)
-    # These would ideally be based on the patient's baseline
-    base_heart_rate = random.randint(65, 85)
-    base_systolic = random.randint(110, 140)
-    base_diastolic = random.randint(70, 90)
-    base_temperature = round(random.uniform(36.5, 37.3), 1)
-    base_respiratory_rate = random.randint(12, 18)
-    base_oxygen = random.randint(94, 99)
-    base_glucose = random.randint(80, 120)
-    
-    # Add some random variation to simulate real-time changes
-    heart_rate = max(40, min(120, base_heart_rate + random.randint(-5, 5)))
-    systolic = max(90, min(180, base_systolic + random.randint(-8, 8)))
-    diastolic = max(50, min(110, base_diastolic + random.randint(-5, 5)))
-    temperature = round(max(35.5, min(38.0, base_temperature + random.uniform(-0.2, 0.2))), 1)
-    respiratory_rate = max(10, min(25, base_respiratory_rate + random.randint(-2, 2)))
-    oxygen = max(88, min(100, base_oxygen + random.randint(-2, 2)))
-    glucose = max(60, min(200, base_glucose + random.randint(-10, 10)))
-    
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    return {
-        'patient_id': patient_id,
-        'timestamp': now,
-        'heart_rate': heart_rate,
-        'blood_pressure_systolic': systolic,
-        'blood_pressure_diastolic': diastolic,
-        'temperature': temperature,
-        'respiratory_rate': respiratory_rate,
-        'oxygen_saturation': oxygen,
-        'glucose': glucose
-    }
+# Each patient has a persistent simulator seeded from their stored vitals, so
+# successive readings follow on from each other instead of being redrawn
+def simulate_live_data(patient_id, timestamp=None):
+    return vitals_sim.get_simulator(patient_id).tick(timestamp)
 
 # Ensure data exists for the application
 def ensure_data_exists():
@@ -252,7 +152,7 @@ def ensure_data_exists():
         os.makedirs('data')
     
     # Check if patient data exists
-    if not os.path.exists('data/patients.csv'):
+    if not data_store.table_exists('patients'):
         st.warning("Patient data not found. Please run generate_dummy_data.py first.")
         
         # Create a simple dataset with one patient for demonstration
@@ -289,7 +189,7 @@ def ensure_data_exists():
         }
         
         # Save as single-row DataFrame
-        pd.DataFrame([patient]).to_csv('data/patients.csv', index=False)
+        patient_index.write_patients([patient])
         
         # Generate supporting data for this patient
         patient_id = patient['id']
@@ -299,7 +199,7 @@ def ensure_data_exists():
         return pd.DataFrame([patient])
     
     # Load existing patient data
-    return pd.read_csv('data/patients.csv')
+    return data_store.read_table('patients')
 
 # --- Display Functions ---
 
@@ -449,16 +349,260 @@ def display_patient_profile(patient):
         st.success("Notes saved successfully!")
     st.markdown('</div>', unsafe_allow_html=True)
 
+# Downsampling applied to the history charts
+DOWNSAMPLING_METHODS = {
+    "Min-max": 'minmax',
+    "LTTB": 'lttb',
+    "Off": None,
+}
+
+# Layouts of the history charts: one SVG figure per vital, or a single WebGL
+# figure with a panel per vital on a shared time axis
+CHART_LAYOUTS = {
+    "Separate charts": 'separate',
+    "Combined (WebGL)": 'combined',
+}
+
+# Panels of the combined chart: axis title, traces (column, name, line color,
+# rollup band color as 'r, g, b') and normal-range lines (column, bound, color)
+COMBINED_PANELS = [
+    ('Heart Rate (bpm)',
+     [('heart_rate', 'Heart Rate', '#636efa', '99, 110, 250')],
+     [('heart_rate', 'normal_low', 'green'), ('heart_rate', 'normal_high', 'green')]),
+    ('Blood Pressure (mmHg)',
+     [('blood_pressure_systolic', 'Systolic', 'red', '255, 0, 0'),
+      ('blood_pressure_diastolic', 'Diastolic', 'blue', '0, 0, 255')],
+     [('blood_pressure_systolic', 'normal_high', 'red'), ('blood_pressure_diastolic', 'normal_high', 'blue')]),
+    ('SpO2 (%)',
+     [('oxygen_saturation', 'SpO2', '#00cc96', '0, 204, 150')],
+     [('oxygen_saturation', 'normal_low', 'green')]),
+    ('Glucose (mg/dL)',
+     [('glucose', 'Glucose', '#ab63fa', '171, 99, 250')],
+     [('glucose', 'normal_low', 'green'), ('glucose', 'normal_high', 'green')]),
+]
+
+# Vitals of the combined chart in trace order
+COMBINED_COLUMNS = [column for _, traces, _ in COMBINED_PANELS for column, _, _, _ in traces]
+
+# Live stream window sizes (readings at one per tick)
+LIVE_WINDOWS = {
+    "20 readings": 20,
+    "5 minutes": int(5 * 60 / live_stream.TICK_SECONDS),
+    "1 hour": int(60 * 60 / live_stream.TICK_SECONDS),
+    "4 hours": int(4 * 60 * 60 / live_stream.TICK_SECONDS),
+}
+
+# Vitals plotted on the live chart
+LIVE_TRACES = {
+    'heart_rate': 'Heart Rate (bpm)',
+    'blood_pressure_systolic': 'Systolic BP (mmHg)',
+    'blood_pressure_diastolic': 'Diastolic BP (mmHg)',
+    'oxygen_saturation': 'SpO2 (%)',
+}
+
+# Shade the min-max and p5-p95 ranges of a rollup trace (color as 'r, g, b'),
+# on the given subplot row of a combined chart
+def add_rollup_bands(fig, data, column, color, row=None):
+    col = None if row is None else 1
+    for low, high, opacity, name in [('min', 'max', 0.08, 'Min–max'), ('p5', 'p95', 0.18, 'p5–p95')]:
+        fig.add_trace(go.Scatter(x=data['datetime'], y=data[f'{column}_{high}'], mode='lines',
+                                 line=dict(width=0), showlegend=False, hoverinfo='skip'), row=row, col=col)
+        fig.add_trace(go.Scatter(x=data['datetime'], y=data[f'{column}_{low}'], mode='lines',
+                                 line=dict(width=0), fill='tonexty', fillcolor=f'rgba({color}, {opacity})',
+                                 name=name, showlegend=row is None, hoverinfo='skip'), row=row, col=col)
+
+# Most out-of-range episodes shaded on a single chart (longest first)
+MAX_SHADED_EPISODES = 30
+
+# Axis suffix of a subplot row ('' for the first row, then '2', '3', ...)
+def axis_suffix(row):
+    return '' if row == 1 else str(row)
+
+# Shapes shading the periods where any of the given vitals was out of range
+# (on the given subplot row of a combined chart)
+def alert_episode_shapes(data, *vitals, row=None):
+    if data.empty:
+        return []
+    xref, yref = 'x', 'paper'
+    if row is not None:
+        xref, yref = f'x{axis_suffix(row)}', f'y{axis_suffix(row)} domain'
+    found = pd.concat([vitals_alerts.episodes(data['datetime'], data[vital], vital) for vital in vitals])
+    found = found.sort_values('duration', ascending=False).head(MAX_SHADED_EPISODES)
+    
+    # Shapes are added in one layout update; add_vrect per episode is far slower
+    shapes = []
+    for episode in found.itertuples():
+        color = 'red' if episode.peak_level == vitals_alerts.DANGER else 'orange'
+        # Single readings get a minimum width so they remain visible
+        end = max(episode.end, episode.start + np.timedelta64(5, 'm'))
+        shapes.append(dict(type='rect', xref=xref, yref=yref, x0=episode.start, x1=end, y0=0, y1=1,
+                           fillcolor=color, opacity=0.12, line_width=0, layer='below'))
+    return shapes
+
+# Shade the periods where any of the given vitals was out of range
+def shade_alert_episodes(fig, data, *vitals):
+    shapes = alert_episode_shapes(data, *vitals)
+    if shapes:
+        fig.update_layout(shapes=list(fig.layout.shapes) + shapes)
+
+# Rows, first and last time of a window slice (identifies the slice for the figure cache)
+def frame_extent(frame):
+    if frame.empty:
+        return (0, None, None)
+    return (len(frame), frame['datetime'].iloc[0], frame['datetime'].iloc[-1])
+
+# Draw a vitals chart from the figure cache. `columns` are the vitals plotted
+# by the figure's first traces, which the live reading is appended to.
+def plot_vitals_chart(name, view, signature, build, live, columns):
+    serialized = figure_cache.cached_figure(view + (name,), signature, build)
+    if live is None:
+        figure = figure_cache.load_figure(serialized)
+    else:
+        figure = figure_cache.load_figure(serialized, pd.to_datetime(live['timestamp']), live, columns)
+    st.plotly_chart(figure, use_container_width=True)
+
+# Heart rate chart of the plotted data (`history` holds the raw readings of the
+# window, used for the alert shading)
+def heart_rate_figure(data, history, resolution, max_points, method):
+    fig = px.line(downsample.downsample_frame(data, ['heart_rate'], max_points, method),
+                  x='datetime', y='heart_rate', 
+                  title='Heart Rate Over Time',
+                  labels={'heart_rate': 'Heart Rate (bpm)', 'datetime': 'Time'})
+    
+    # Add reference lines for normal range
+    hr_low, hr_high = vitals_alerts.THRESHOLDS.loc['heart_rate', ['normal_low', 'normal_high']]
+    fig.add_shape(type="line", line=dict(dash="dash", color="green"),
+                  x0=data['datetime'].min(), y0=hr_low, x1=data['datetime'].max(), y1=hr_low)
+    fig.add_shape(type="line", line=dict(dash="dash", color="green"),
+                  x0=data['datetime'].min(), y0=hr_high, x1=data['datetime'].max(), y1=hr_high)
+    
+    if resolution != 'raw':
+        add_rollup_bands(fig, data, 'heart_rate', '99, 110, 250')
+    shade_alert_episodes(fig, history, 'heart_rate')
+    return fig
+
+# Blood pressure chart (systolic and diastolic traces first)
+def blood_pressure_figure(data, history, resolution, max_points, method):
+    bp_data = downsample.downsample_frame(data, ['blood_pressure_systolic', 'blood_pressure_diastolic'],
+                                          max_points, method)
+    fig = go.Figure()
+    
+    # Add systolic line
+    fig.add_trace(go.Scatter(x=bp_data['datetime'], y=bp_data['blood_pressure_systolic'],
+                             mode='lines', name='Systolic', line=dict(color='red')))
+    
+    # Add diastolic line
+    fig.add_trace(go.Scatter(x=bp_data['datetime'], y=bp_data['blood_pressure_diastolic'],
+                             mode='lines', name='Diastolic', line=dict(color='blue')))
+    
+    # Add reference lines (upper end of the normal ranges)
+    systolic_high = vitals_alerts.THRESHOLDS.loc['blood_pressure_systolic', 'normal_high']
+    diastolic_high = vitals_alerts.THRESHOLDS.loc['blood_pressure_diastolic', 'normal_high']
+    fig.add_shape(type="line", line=dict(dash="dash", color="red", width=1),
+                  x0=bp_data['datetime'].min(), y0=systolic_high, x1=bp_data['datetime'].max(), y1=systolic_high)
+    fig.add_shape(type="line", line=dict(dash="dash", color="blue", width=1),
+                  x0=bp_data['datetime'].min(), y0=diastolic_high, x1=bp_data['datetime'].max(), y1=diastolic_high)
+    
+    fig.update_layout(title='Blood Pressure Over Time',
+                      xaxis_title='Time',
+                      yaxis_title='Blood Pressure (mmHg)')
+    
+    if resolution != 'raw':
+        add_rollup_bands(fig, bp_data, 'blood_pressure_systolic', '255, 0, 0')
+        add_rollup_bands(fig, bp_data, 'blood_pressure_diastolic', '0, 0, 255')
+    shade_alert_episodes(fig, history, 'blood_pressure_systolic', 'blood_pressure_diastolic')
+    return fig
+
+# Oxygen saturation chart
+def oxygen_figure(data, history, resolution, max_points, method):
+    fig = px.line(downsample.downsample_frame(data, ['oxygen_saturation'], max_points, method),
+                  x='datetime', y='oxygen_saturation', 
+                  title='Oxygen Saturation Over Time',
+                  labels={'oxygen_saturation': 'SpO2 (%)', 'datetime': 'Time'},
+                  color_discrete_sequence=['#00cc96'])
+    
+    # Add reference line for normal range
+    o2_low = vitals_alerts.THRESHOLDS.loc['oxygen_saturation', 'normal_low']
+    fig.add_shape(type="line", line=dict(dash="dash", color="green"),
+                  x0=data['datetime'].min(), y0=o2_low, x1=data['datetime'].max(), y1=o2_low)
+    
+    fig.update_yaxes(range=[85, 100])
+    
+    if resolution != 'raw':
+        add_rollup_bands(fig, data, 'oxygen_saturation', '0, 204, 150')
+    shade_alert_episodes(fig, history, 'oxygen_saturation')
+    return fig
+
+# Blood glucose chart
+def glucose_figure(data, history, resolution, max_points, method):
+    fig = px.line(downsample.downsample_frame(data, ['glucose'], max_points, method),
+                  x='datetime', y='glucose', 
+                  title='Blood Glucose Over Time',
+                  labels={'glucose': 'Glucose (mg/dL)', 'datetime': 'Time'},
+                  color_discrete_sequence=['#ab63fa'])
+    
+    # Add reference lines for normal range
+    glucose_low, glucose_high = vitals_alerts.THRESHOLDS.loc['glucose', ['normal_low', 'normal_high']]
+    fig.add_shape(type="line", line=dict(dash="dash", color="green"),
+                  x0=data['datetime'].min(), y0=glucose_low, x1=data['datetime'].max(), y1=glucose_low)
+    fig.add_shape(type="line", line=dict(dash="dash", color="green"),
+                  x0=data['datetime'].min(), y0=glucose_high, x1=data['datetime'].max(), y1=glucose_high)
+    
+    if resolution != 'raw':
+        add_rollup_bands(fig, data, 'glucose', '171, 99, 250')
+    shade_alert_episodes(fig, history, 'glucose')
+    return fig
+
+# All vitals in one figure: a WebGL panel per vital on a shared time axis.
+# Every trace uses the same downsampled rows, and timestamps are sent as epoch
+# milliseconds so each x array is a compact binary block instead of ISO strings.
+def combined_vitals_figure(data, history, resolution, max_points, method):
+    plotted = downsample.downsample_frame(data, COMBINED_COLUMNS, max_points * len(COMBINED_PANELS), method)
+    x = plotted['datetime'].to_numpy(dtype='datetime64[ms]').astype(np.int64).astype(float)
+    
+    fig = make_subplots(rows=len(COMBINED_PANELS), cols=1, shared_xaxes=True, vertical_spacing=0.03)
+    
+    # Vital traces first (in COMBINED_COLUMNS order) so the live reading can be appended to them
+    for row, (_, traces, _) in enumerate(COMBINED_PANELS, start=1):
+        for column, name, color, _ in traces:
+            fig.add_trace(go.Scattergl(x=x, y=plotted[column].to_numpy(dtype=float), mode='lines',
+                                       name=name, line=dict(color=color, width=1)), row=row, col=1)
+    
+    # Shapes and axis settings of every panel go into a single layout update;
+    # add_hline and per-panel updates revalidate all existing shapes each time
+    shapes = []
+    axes = {}
+    for row, (title, traces, lines) in enumerate(COMBINED_PANELS, start=1):
+        suffix = axis_suffix(row)
+        # Reference lines span the panel, so they never need to follow the data
+        for column, bound, color in lines:
+            y = vitals_alerts.THRESHOLDS.loc[column, bound]
+            shapes.append(dict(type='line', xref=f'x{suffix} domain', yref=f'y{suffix}', x0=0, x1=1, y0=y, y1=y,
+                               line=dict(dash="dash", color=color, width=1)))
+        
+        if resolution != 'raw':
+            for column, _, _, band in traces:
+                add_rollup_bands(fig, data, column, band, row=row)
+        shapes += alert_episode_shapes(history, *[column for column, _, _, _ in traces], row=row)
+        axes[f'yaxis{suffix}'] = dict(title_text=title)
+        axes[f'xaxis{suffix}'] = dict(type='date')
+    
+    axes['yaxis3']['range'] = [85, 100]
+    axes[f'xaxis{axis_suffix(len(COMBINED_PANELS))}']['title_text'] = 'Time'
+    fig.update_layout(shapes=shapes, title='Vital Signs Over Time', height=220 * len(COMBINED_PANELS),
+                      hovermode='x unified', margin=dict(t=60, b=40), **axes)
+    return fig
+
 # Function to display live monitoring
 def display_live_monitoring(patient_id):
     st.markdown('<h2 class="sub-header">Live Patient Monitoring</h2>', unsafe_allow_html=True)
     
-    # Check if historical data exists
-    try:
-        historical_data = pd.read_csv(f'data/vitals_{patient_id}.csv')
-    except:
+    # Time-indexed history (timestamps parsed and sorted once per file version)
+    vitals = vitals_store.load_vitals(patient_id)
+    if vitals is None:
         # Generate data if it doesn't exist
-        historical_data = pd.DataFrame(generate_vital_signs(patient_id))
+        generate_vital_signs(patient_id)
+        vitals = vitals_store.load_vitals(patient_id)
     
     # Current vitals display
     st.markdown("### Current Vital Signs")
@@ -470,104 +614,29 @@ def display_live_monitoring(patient_id):
     # Get the latest vitals
     latest_vitals = simulate_live_data(patient_id)
     
-    # Display KPIs in columns
-    col1, col2, col3, col4 = st.columns(4)
-    
-    # Heart Rate
-    with col1:
-        hr_value = latest_vitals['heart_rate']
-        hr_class = "normal-value"
-        if hr_value < 60 or hr_value > 100:
-            hr_class = "warning-value"
-        if hr_value < 50 or hr_value > 120:
-            hr_class = "danger-value"
-        
-        st.markdown('<div class="kpi-card">', unsafe_allow_html=True)
-        st.markdown('<p class="kpi-title">Heart Rate</p>', unsafe_allow_html=True)
-        st.markdown(f'<p class="kpi-value {hr_class}">{hr_value} <span style="font-size:1rem">bpm</span></p>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Blood Pressure
-    with col2:
-        bp_systolic = latest_vitals['blood_pressure_systolic']
-        bp_diastolic = latest_vitals['blood_pressure_diastolic']
-        
-        bp_class = "normal-value"
-        if bp_systolic > 130 or bp_systolic < 90 or bp_diastolic > 80 or bp_diastolic < 60:
-            bp_class = "warning-value"
-        if bp_systolic > 180 or bp_systolic < 80 or bp_diastolic > 120 or bp_diastolic < 50:
-            bp_class = "danger-value"
-        
-        st.markdown('<div class="kpi-card">', unsafe_allow_html=True)
-        st.markdown('<p class="kpi-title">Blood Pressure</p>', unsafe_allow_html=True)
-        st.markdown(f'<p class="kpi-value {bp_class}">{bp_systolic}/{bp_diastolic} <span style="font-size:1rem">mmHg</span></p>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Oxygen Saturation
-    with col3:
-        o2_value = latest_vitals['oxygen_saturation']
-        o2_class = "normal-value"
-        if o2_value < 95:
-            o2_class = "warning-value"
-        if o2_value < 90:
-            o2_class = "danger-value"
-        
-        st.markdown('<div class="kpi-card">', unsafe_allow_html=True)
-        st.markdown('<p class="kpi-title">Oxygen Saturation</p>', unsafe_allow_html=True)
-        st.markdown(f'<p class="kpi-value {o2_class}">{o2_value}% <span style="font-size:1rem">SpO2</span></p>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Temperature
-    with col4:
-        temp_value = latest_vitals['temperature']
-        temp_class = "normal-value"
-        if temp_value > 37.5 or temp_value < 36.0:
-            temp_class = "warning-value"
-        if temp_value > 38.0 or temp_value < 35.5:
-            temp_class = "danger-value"
-        
-        st.markdown('<div class="kpi-card">', unsafe_allow_html=True)
-        st.markdown('<p class="kpi-title">Temperature</p>', unsafe_allow_html=True)
-        st.markdown(f'<p class="kpi-value {temp_class}">{temp_value}°C <span style="font-size:1rem"></span></p>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    # KPI cards, both rows in a single element
+    vital_cards = [
+        html_blocks.kpi_card('Heart Rate', latest_vitals['heart_rate'], 'bpm',
+                             vitals_alerts.css_class(latest_vitals, 'heart_rate')),
+        html_blocks.kpi_card('Blood Pressure',
+                             f"{latest_vitals['blood_pressure_systolic']}/{latest_vitals['blood_pressure_diastolic']}", 'mmHg',
+                             vitals_alerts.css_class(latest_vitals, 'blood_pressure_systolic', 'blood_pressure_diastolic')),
+        html_blocks.kpi_card('Oxygen Saturation', f"{latest_vitals['oxygen_saturation']}%", 'SpO2',
+                             vitals_alerts.css_class(latest_vitals, 'oxygen_saturation')),
+        html_blocks.kpi_card('Temperature', f"{latest_vitals['temperature']}°C", '',
+                             vitals_alerts.css_class(latest_vitals, 'temperature')),
+    ]
     
     # Second row of KPIs
-    col1, col2, col3 = st.columns(3)
-    
-    # Respiratory Rate
-    with col1:
-        rr_value = latest_vitals['respiratory_rate']
-        rr_class = "normal-value"
-        if rr_value < 12 or rr_value > 20:
-            rr_class = "warning-value"
-        if rr_value < 10 or rr_value > 30:
-            rr_class = "danger-value"
-        
-        st.markdown('<div class="kpi-card">', unsafe_allow_html=True)
-        st.markdown('<p class="kpi-title">Respiratory Rate</p>', unsafe_allow_html=True)
-        st.markdown(f'<p class="kpi-value {rr_class}">{rr_value} <span style="font-size:1rem">breaths/min</span></p>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    other_cards = [
+        html_blocks.kpi_card('Respiratory Rate', latest_vitals['respiratory_rate'], 'breaths/min',
+                             vitals_alerts.css_class(latest_vitals, 'respiratory_rate')),
+        html_blocks.kpi_card('Blood Glucose', latest_vitals['glucose'], 'mg/dL',
+                             vitals_alerts.css_class(latest_vitals, 'glucose')),
+        html_blocks.kpi_card('Last Updated', latest_vitals['timestamp'], value_style='font-size:1.2rem'),
+    ]
     
-    # Glucose
-    with col2:
-        glucose_value = latest_vitals['glucose']
-        glucose_class = "normal-value"
-        if glucose_value < 70 or glucose_value > 140:
-            glucose_class = "warning-value"
-        if glucose_value < 55 or glucose_value > 200:
-            glucose_class = "danger-value"
-        
-        st.markdown('<div class="kpi-card">', unsafe_allow_html=True)
-        st.markdown('<p class="kpi-title">Blood Glucose</p>', unsafe_allow_html=True)
-        st.markdown(f'<p class="kpi-value {glucose_class}">{glucose_value} <span style="font-size:1rem">mg/dL</span></p>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Last Updated
-    with col3:
-        st.markdown('<div class="kpi-card">', unsafe_allow_html=True)
-        st.markdown('<p class="kpi-title">Last Updated</p>', unsafe_allow_html=True)
-        st.markdown(f'<p class="kpi-value" style="font-size:1.2rem">{latest_vitals["timestamp"]}</p>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    html_blocks.render(html_blocks.card_grid(vital_cards, 4), html_blocks.card_grid(other_cards, 3))
     
     st.markdown("<hr/>", unsafe_allow_html=True)
     
@@ -582,173 +651,215 @@ def display_live_monitoring(patient_id):
         "Last Month": 30
     }
     
-    selected_period = st.selectbox("Select Time Period", list(time_periods.keys()))
-    days = time_periods[selected_period]
-    
-    # Convert timestamp to datetime
-    historical_data['datetime'] = pd.to_datetime(historical_data['timestamp'])
-    
-    # Filter data based on selected time period
-    cutoff_date = datetime.now() - timedelta(days=days)
-    filtered_data = historical_data[historical_data['datetime'] >= cutoff_date]
-    
-    # Add the latest data point
-    latest_data = pd.DataFrame([latest_vitals])
-    latest_data['datetime'] = pd.to_datetime(latest_data['timestamp'])
+    col1, col2, col3, col4 = st.columns(4)
     
-    all_data = pd.concat([filtered_data, latest_data]).reset_index(drop=True)
+    with col1:
+        selected_period = st.selectbox("Select Time Period", list(time_periods.keys()))
+        days = time_periods[selected_period]
     
-    # Charts
-    chart_col1, chart_col2 = st.columns(2)
+    with col2:
+        downsampling = st.selectbox("Downsampling", list(DOWNSAMPLING_METHODS.keys()),
+                                    help="Min-max keeps every out-of-range reading visible")
+        method = DOWNSAMPLING_METHODS[downsampling]
     
-    with chart_col1:
-        st.subheader("Heart Rate")
-        
-        # Heart rate chart
-        fig_hr = px.line(all_data, x='datetime', y='heart_rate', 
-                        title='Heart Rate Over Time',
-                        labels={'heart_rate': 'Heart Rate (bpm)', 'datetime': 'Time'})
-        
-        # Add reference lines for normal range
-        fig_hr.add_shape(type="line", line=dict(dash="dash", color="green"),
-                        x0=all_data['datetime'].min(), y0=60, x1=all_data['datetime'].max(), y1=60)
-        fig_hr.add_shape(type="line", line=dict(dash="dash", color="green"),
-                        x0=all_data['datetime'].min(), y0=100, x1=all_data['datetime'].max(), y1=100)
-        
-        st.plotly_chart(fig_hr, use_container_width=True)
-        
-        st.subheader("Blood Pressure")
-        
-        # Blood pressure chart
-        bp_data = all_data.copy()
-        fig_bp = go.Figure()
-        
-        # Add systolic line
-        fig_bp.add_trace(go.Scatter(x=bp_data['datetime'], y=bp_data['blood_pressure_systolic'],
-                                  mode='lines', name='Systolic', line=dict(color='red')))
-        
-        # Add diastolic line
-        fig_bp.add_trace(go.Scatter(x=bp_data['datetime'], y=bp_data['blood_pressure_diastolic'],
-                                  mode='lines', name='Diastolic', line=dict(color='blue')))
-        
-        # Add reference lines
-        fig_bp.add_shape(type="line", line=dict(dash="dash", color="red", width=1),
-                       x0=bp_data['datetime'].min(), y0=120, x1=bp_data['datetime'].max(), y1=120)
-        fig_bp.add_shape(type="line", line=dict(dash="dash", color="blue", width=1),
-                       x0=bp_data['datetime'].min(), y0=80, x1=bp_data['datetime'].max(), y1=80)
-        
-        fig_bp.update_layout(title='Blood Pressure Over Time',
-                           xaxis_title='Time',
-                           yaxis_title='Blood Pressure (mmHg)')
-        
-        st.plotly_chart(fig_bp, use_container_width=True)
+    with col3:
+        chart_width = st.number_input("Chart width (px)", min_value=200, max_value=4000, value=700, step=100)
+        max_points = downsample.max_points_for_width(chart_width)
     
-    with chart_col2:
-        st.subheader("Oxygen Saturation")
-        
-        # Oxygen saturation chart
-        fig_o2 = px.line(all_data, x='datetime', y='oxygen_saturation', 
-                        title='Oxygen Saturation Over Time',
-                        labels={'oxygen_saturation': 'SpO2 (%)', 'datetime': 'Time'})
-        
-        # Add reference line for normal range
-        fig_o2.add_shape(type="line", line=dict(dash="dash", color="green"),
-                        x0=all_data['datetime'].min(), y0=95, x1=all_data['datetime'].max(), y1=95)
-        
-        fig_o2.update_yaxes(range=[85, 100])
-        
-        st.plotly_chart(fig_o2, use_container_width=True)
-        
-        st.subheader("Blood Glucose")
+    with col4:
+        chart_layout = st.selectbox("Chart layout", list(CHART_LAYOUTS.keys()),
+                                    help="Combined draws every vital in one WebGL figure, for dense histories")
+        layout = CHART_LAYOUTS[chart_layout]
+    
+    # Zooming narrows the queried window, so the same point budget covers a
+    # shorter span and the chart is refetched at a higher resolution
+    zoom_start, zoom_end = st.slider("Zoom (% of period)", min_value=0, max_value=100, value=(0, 100),
+                                     key=f"zoom_{selected_period}")
+    
+    now = datetime.now()
+    period_start = now - timedelta(days=days)
+    window_start = period_start + timedelta(days=days) * (zoom_start / 100)
+    window_end = period_start + timedelta(days=days) * (zoom_end / 100)
+    
+    # Slice the selected window (binary search on the sorted timestamps)
+    filtered_data = vitals.range(window_start, window_end)
+    
+    if zoom_end == 100:
+        # Add the latest data point
+        latest_data = pd.DataFrame([latest_vitals])
+        latest_data['datetime'] = pd.to_datetime(latest_data['timestamp'])
         
-        # Glucose chart
-        fig_glucose = px.line(all_data, x='datetime', y='glucose', 
-                             title='Blood Glucose Over Time',
-                             labels={'glucose': 'Glucose (mg/dL)', 'datetime': 'Time'})
+        all_data = pd.concat([filtered_data, latest_data]).reset_index(drop=True)
+    else:
+        all_data = filtered_data.reset_index(drop=True)
+    
+    # Windows with more readings than the point budget are drawn from a
+    # materialized rollup (mean line with min-max and p5-p95 bands) instead of
+    # downsampling every reading; windows too short for a rollup are downsampled
+    resolution = vitals_rollups.choose_resolution(window_end - window_start, len(all_data), max_points)
+    if resolution != 'raw':
+        all_data = vitals_rollups.load_rollups(patient_id).range(resolution, window_start, window_end).reset_index(drop=True)
+        st.caption(f"Showing {resolution} rollup of {len(filtered_data):,} readings (mean with p5–p95 and min–max bands)")
+    elif len(all_data) > max_points and method:
+        st.caption(f"Showing up to {max_points:,} of {len(all_data):,} readings per chart ({downsampling} downsampling)")
+    
+    # Charts are cached per patient, period and view, and only rebuilt when the
+    # plotted window changes; the newest live reading is appended to the cached figure
+    history = filtered_data.reset_index(drop=True) if resolution == 'raw' else all_data
+    view = (patient_id, selected_period, zoom_start, zoom_end, method, max_points)
+    signature = (data_store.table_version('vitals', patient_id), resolution,
+                 frame_extent(filtered_data), frame_extent(history))
+    live = latest_vitals if zoom_end == 100 and resolution == 'raw' else None
+    
+    if layout == 'combined':
+        plot_vitals_chart('combined', view, signature,
+                          lambda: combined_vitals_figure(history, filtered_data, resolution, max_points, method),
+                          live, COMBINED_COLUMNS)
+    else:
+        chart_col1, chart_col2 = st.columns(2)
         
-        # Add reference lines for normal range
-        fig_glucose.add_shape(type="line", line=dict(dash="dash", color="green"),
-                             x0=all_data['datetime'].min(), y0=70, x1=all_data['datetime'].max(), y1=70)
-        fig_glucose.add_shape(type="line", line=dict(dash="dash", color="green"),
-                             x0=all_data['datetime'].min(), y0=140, x1=all_data['datetime'].max(), y1=140)
+        with chart_col1:
+            st.subheader("Heart Rate")
+            
+            # Heart rate chart
+            plot_vitals_chart('heart_rate', view, signature,
+                              lambda: heart_rate_figure(history, filtered_data, resolution, max_points, method),
+                              live, ['heart_rate'])
+            
+            st.subheader("Blood Pressure")
+            
+            # Blood pressure chart
+            plot_vitals_chart('blood_pressure', view, signature,
+                              lambda: blood_pressure_figure(history, filtered_data, resolution, max_points, method),
+                              live, ['blood_pressure_systolic', 'blood_pressure_diastolic'])
         
-        st.plotly_chart(fig_glucose, use_container_width=True)
+        with chart_col2:
+            st.subheader("Oxygen Saturation")
+            
+            # Oxygen saturation chart
+            plot_vitals_chart('oxygen_saturation', view, signature,
+                              lambda: oxygen_figure(history, filtered_data, resolution, max_points, method),
+                              live, ['oxygen_saturation'])
+            
+            st.subheader("Blood Glucose")
+            
+            # Glucose chart
+            plot_vitals_chart('glucose', view, signature,
+                              lambda: glucose_figure(history, filtered_data, resolution, max_points, method),
+                              live, ['glucose'])
     
     # Live data simulation
     st.markdown("### Live Data Stream")
     st.markdown("This section simulates real-time data streaming from patient monitoring devices.")
     
-    # Placeholder for live data
-    live_chart_placeholder = st.empty()
+    # One stream per browser session, fed by the shared background producer
+    session_id = get_session_id()
+    streaming = live_stream.is_streaming(session_id, patient_id)
     
-    # Live data demo
-    if st.button("Start Live Data Demo", key="live_demo"):
-        # Show live data for 30 seconds (or until the user navigates away)
-        start_time = time.time()
-        live_data = []
-        
-        while time.time() - start_time < 30:  # Run for 30 seconds
-            # Generate new data point
-            new_data = simulate_live_data(patient_id)
-            live_data.append(new_data)
-            
-            # Keep only the last 20 points for display
-            if len(live_data) > 20:
-                live_data = live_data[-20:]
-            
-            # Create DataFrame
-            live_df = pd.DataFrame(live_data)
-            live_df['datetime'] = pd.to_datetime(live_df['timestamp'])
-            
-            # Create chart
-            fig = px.line(live_df, x='datetime', y=['heart_rate', 'blood_pressure_systolic', 
-                                                  'blood_pressure_diastolic', 'oxygen_saturation'],
-                        labels={
-                            'heart_rate': 'Heart Rate (bpm)',
-                            'blood_pressure_systolic': 'Systolic BP (mmHg)',
-                            'blood_pressure_diastolic': 'Diastolic BP (mmHg)',
-                            'oxygen_saturation': 'SpO2 (%)',
-                            'datetime': 'Time'
-                        },
-                        title='Live Patient Monitoring Data')
-            
-            # Update the chart
-            live_chart_placeholder.plotly_chart(fig, use_container_width=True)
-            
-            # Wait for a short time
-            time.sleep(1.5)
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        # Keyed per patient so switching patient never resumes the previous stream
+        live_enabled = st.toggle("Stream live data", value=streaming, key=f"live_stream_{patient_id}")
+    
+    with col2:
+        # Window of readings kept in the live buffer
+        window_label = st.select_slider("Live window", options=list(LIVE_WINDOWS.keys()), key="live_window")
+        window_size = LIVE_WINDOWS[window_label]
+    
+    if live_enabled and not streaming:
+        live_stream.start(session_id, patient_id, simulate_live_data, buffer_size=window_size)
+        streaming = True
+    elif not live_enabled and streaming:
+        live_stream.stop(session_id)
+        streaming = False
+    
+    if streaming:
+        live_stream.set_window(session_id, window_size)
+    
+    if streaming:
+        render_live_stream(session_id, max_points)
+
+# Live chart, refreshed on a timer without rerunning the rest of the page.
+# Traces are built straight from the ring buffer arrays (no DataFrame or
+# timestamp parsing), and a window longer than the chart is wide is reduced to
+# `max_points` with min-max downsampling, so the size of each refresh stays
+# bounded whatever the window size. Timestamps go out as epoch milliseconds
+# (compact binary arrays) on a date axis.
+@st.fragment(run_every=live_stream.TICK_SECONDS)
+def render_live_stream(session_id, max_points):
+    window = live_stream.poll(session_id)
+    if window is None or not len(window[0]):
+        st.info("Live data stream stopped.")
+        return
+    
+    times, values = window
+    rows = [live_stream.COLUMNS.index(column) for column in LIVE_TRACES]
+    if len(times) > max_points:
+        # The budget is shared between the traces; their picks are merged
+        budget = max(4, max_points // len(rows))
+        keep = np.unique(np.concatenate([downsample.minmax_indices(values[row], budget) for row in rows]))
+        times, values = times[keep], values[:, keep]
+    x = times.astype('datetime64[ms]').astype(np.int64).astype(float)
+    
+    fig = go.Figure()
+    for row, label in zip(rows, LIVE_TRACES.values()):
+        fig.add_trace(go.Scatter(x=x, y=values[row], mode='lines', name=label))
+    
+    fig.update_layout(title='Live Patient Monitoring Data', xaxis_title='Time', yaxis_title='Value',
+                      xaxis_type='date')
+    
+    st.plotly_chart(fig, use_container_width=True)
 
 # Function to display medical reports
 def display_medical_reports(patient_id):
     st.markdown('<h2 class="sub-header">Medical Reports</h2>', unsafe_allow_html=True)
     
     # Check if reports exist
-    reports_file = f'data/reports_{patient_id}.csv'
-    if os.path.exists(reports_file):
-        reports_df = pd.read_csv(reports_file)
-    else:
+    reports = reports_store.load_reports(patient_id)
+    if reports is None:
         st.info("No medical reports found for this patient. Please run generate_dummy_data.py to create sample reports.")
         return
+    # Full-text search across report content, summaries and specialists
+    search_col, scope_col = st.columns([3, 1])
+    with search_col:
+        query = st.text_input("Search reports", placeholder='Words or "exact phrase"', key="report_query")
+    with scope_col:
+        all_patients = st.checkbox("All patients", key="report_query_all")
+    
+    if query.strip():
+        search_start = time.perf_counter()
+        results = report_search.search(query, None if all_patients else patient_id)
+        elapsed_ms = (time.perf_counter() - search_start) * 1000
+        if results.empty:
+            st.info("No reports match this search.")
+        else:
+            st.caption(f"Top {len(results)} matches in {elapsed_ms:.0f} ms")
+            st.dataframe(results, hide_index=True, use_container_width=True)
     
-    # Filter options
+    # Filter options (facet values and dates are indexed once per file version)
+    report_facets = facets.load_report_facets(patient_id)
+    if not len(report_facets):
+        # A header-only file has no dates to bound the filter with
+        st.info("No medical reports found for this patient. Please run generate_dummy_data.py to create sample reports.")
+        return
     st.markdown("### Filter Reports")
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
         # Get unique sources
-        sources = sorted(reports_df['source'].unique())
+        sources = report_facets.options('source')
         selected_sources = st.multiselect("Filter by Source", sources, default=sources)
     
     with col2:
         # Get unique report types
-        report_types = sorted(reports_df['report_type'].unique())
+        report_types = report_facets.options('report_type')
         selected_types = st.multiselect("Filter by Report Type", report_types, default=report_types)
     
     with col3:
         # Date range
-        min_date = pd.to_datetime(reports_df['date']).min().date()
-        max_date = pd.to_datetime(reports_df['date']).max().date()
+        min_date, max_date = (bound.date() for bound in report_facets.date_bounds())
         
         date_range = st.date_input("Date Range", 
                                  value=(min_date, max_date),
@@ -761,180 +872,161 @@ def display_medical_reports(patient_id):
             start_date, end_date = min_date, max_date
     
     # Filter reports
-    filtered_reports = reports_df[
-        (reports_df['source'].isin(selected_sources)) &
-        (reports_df['report_type'].isin(selected_types)) &
-        (pd.to_datetime(reports_df['date']).dt.date >= start_date) &
-        (pd.to_datetime(reports_df['date']).dt.date <= end_date)
-    ]
+    rows, counts = report_facets.query({'source': selected_sources, 'report_type': selected_types},
+                                       start_date, end_date)
+    with col1:
+        st.caption(format_facet_counts(counts['source']))
+    with col2:
+        st.caption(format_facet_counts(counts['report_type']))
     
-    st.markdown(f"### Reports ({len(filtered_reports)} results)")
+    mask = np.zeros(len(report_facets), dtype=bool)
+    mask[rows] = True
+    total = len(rows)
     
-    if filtered_reports.empty:
+    header_col, size_col = st.columns([3, 1])
+    with header_col:
+        st.markdown(f"### Reports ({total} results)")
+    with size_col:
+        page_size = st.selectbox("Reports per page", reports_store.PAGE_SIZES,
+                                 index=reports_store.PAGE_SIZES.index(reports_store.PAGE_SIZE))
+    
+    if total == 0:
         st.info("No reports match the selected filters.")
-    else:
-        # Sort by date (newest first)
-        filtered_reports = filtered_reports.sort_values('date', ascending=False)
+        return
+    
+    # Cursor pagination: a stack of the cursors of the pages visited so far,
+    # started over whenever the filters or the page size change
+    filters = (tuple(selected_sources), tuple(selected_types), start_date, end_date, page_size)
+    paging_key = f"report_pages_{patient_id}"
+    if st.session_state.get(paging_key, {}).get('filters') != filters:
+        st.session_state[paging_key] = {'filters': filters, 'cursors': [None]}
+    cursors = st.session_state[paging_key]['cursors']
+    
+    page_reports, next_cursor = reports.page(cursors[-1], page_size, mask)
+    
+    # Only the opened report renders its body and actions
+    open_key = f"open_report_{patient_id}"
+    open_report = st.session_state.get(open_key)
+    
+    for report_id, report in zip(page_reports['id'], page_reports.to_dict('records')):
+        is_open = report_id == open_report
+        label_col, button_col = st.columns([5, 1])
+        with label_col:
+            source_class = f"source-{report['source'].lower().replace(' ', '')}"
+            st.markdown(f'<span class="source-tag {source_class}">{report["source"]}</span> '
+                        f"**{report['date']}** - {report['report_type']} ({report['specialist']})",
+                        unsafe_allow_html=True)
+        with button_col:
+            if st.button("Close" if is_open else "Open", key=f"toggle_report_{report_id}"):
+                st.session_state[open_key] = None if is_open else report_id
+                st.rerun()
         
-        # Reports container
-        for i, report in filtered_reports.iterrows():
-            # Create an expander for each report
-            with st.expander(f"{report['date']} - {report['report_type']} ({report['source']})"):
-                # Source tag
-                source_class = f"source-{report['source'].lower().replace(' ', '')}"
-                st.markdown(f'<span class="source-tag {source_class}">{report["source"]}</span>', unsafe_allow_html=True)
-                
-                # Report header
-                st.markdown(f"### {report['report_type']}")
-                st.markdown(f"**Date:** {report['date']}")
-                st.markdown(f"**Specialist:** {report['specialist']}")
-                
-                # Summary and AI analysis
-                st.markdown("#### Summary")
-                st.write(report['summary'])
-                
-                st.markdown("#### AI Analysis")
-                st.write(report['nlp_summary'])
-                
-                # Full report content
-                st.markdown("#### Detailed Report")
-                st.text_area("", value=report['content'], height=300, key=f"report_{i}")
-                
-                # Report actions (placeholder)
-                col1, col2, col3 = st.columns([1, 1, 2])
-                
-                with col1:
-                    if st.button("Print", key=f"print_{i}"):
-                        st.info("Printing functionality would be implemented here.")
-                
-                with col2:
-                    if st.button("Share", key=f"share_{i}"):
-                        st.info("Sharing functionality would be implemented here.")
-                
-                with col3:
-                    st.text_input("Add a note about this report", key=f"note_{i}")
+        if is_open:
+            display_report_details(reports.get(report_id))
+    
+    # Page navigation
+    st.caption(f"Page {len(cursors)} of {-(-total // page_size)}")
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        if st.button("← Newer", disabled=len(cursors) == 1, key=f"reports_newer_{patient_id}"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Older →", disabled=next_cursor is None, key=f"reports_older_{patient_id}"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+# Function to summarize facet counts as "value (count)" pairs
+def format_facet_counts(counts):
+    return " · ".join(f"{value} ({count})" for value, count in counts.items() if count)
+
+# Function to display the full body and actions of one opened report
+def display_report_details(report):
+    with st.container(border=True):
+        # Report header
+        st.markdown(f"### {report['report_type']}")
+        st.markdown(f"**Date:** {report['date']}")
+        st.markdown(f"**Specialist:** {report['specialist']}")
+        
+        # Summary and AI analysis
+        st.markdown("#### Summary")
+        st.write(report['summary'])
+        
+        st.markdown("#### AI Analysis")
+        st.write(report['nlp_summary'])
+        
+        # Full report content
+        st.markdown("#### Detailed Report")
+        st.text_area("Detailed Report", value=report['content'], height=300, key=f"report_{report['id']}",
+                     label_visibility="collapsed")
+        
+        # Report actions (placeholder)
+        col1, col2, col3 = st.columns([1, 1, 2])
+        
+        with col1:
+            if st.button("Print", key=f"print_{report['id']}"):
+                st.info("Printing functionality would be implemented here.")
+        
+        with col2:
+            if st.button("Share", key=f"share_{report['id']}"):
+                st.info("Sharing functionality would be implemented here.")
+        
+        with col3:
+            st.text_input("Add a note about this report", key=f"note_{report['id']}")
 
 # Function to display condition timeline
 def display_condition_timeline(patient_id):
     st.markdown('<h2 class="sub-header">Condition Timeline</h2>', unsafe_allow_html=True)
     
-    # Check if timeline data exists
-    timeline_file = f'data/condition_timeline_{patient_id}.csv'
-    if os.path.exists(timeline_file):
-        timeline_data = pd.read_csv(timeline_file)
-    else:
+    # Check if timeline data exists (the model is built once per table version)
+    timeline = condition_timeline.load_timeline(patient_id)
+    if timeline is None:
         st.info("No condition timeline data found for this patient. Please run generate_dummy_data.py to create sample timeline data.")
         return
     
     # Get unique conditions
-    conditions = sorted(timeline_data['condition'].unique())
+    conditions = timeline.conditions
     
     # Condition filter
     selected_conditions = st.multiselect("Filter by Condition", conditions, default=conditions)
     
-    # Filter timeline data
-    filtered_timeline = timeline_data[timeline_data['condition'].isin(selected_conditions)]
-    
-    if filtered_timeline.empty:
+    if not any(timeline.condition_events(condition) for condition in selected_conditions):
         st.info("No condition timeline data available for the selected filters.")
     else:
         # Display timeline visualization
         st.markdown("### Condition Timeline Visualization")
         
-        # Load the timeline data from JSON
         try:
             # Try to import the streamlit_timeline module for visualization
-            try:
-                from streamlit_timeline import timeline as st_timeline
-                
-                timeline_json_file = f'data/timeline_{patient_id}.json'
-                if os.path.exists(timeline_json_file):
-                    with open(timeline_json_file, 'r') as f:
-                        timeline_json_data = json.load(f)
-                    
-                    # Filter the items based on selected conditions
-                    filtered_items = [item for item in timeline_json_data['items'] 
-                                     if item['group'] in selected_conditions]
-                    
-                    # Filter the groups based on selected conditions
-                    filtered_groups = [group for group in timeline_json_data['groups'] 
-                                      if group['id'] in selected_conditions]
-                    
-                    # Create filtered timeline data
-                    filtered_timeline_json = {
-                        'items': filtered_items,
-                        'groups': filtered_groups
-                    }
-                    
-                    # Display timeline
-                    st_timeline(filtered_timeline_json, height="400px")
-                else:
-                    raise FileNotFoundError(f"Timeline JSON file not found: {timeline_json_file}")
-                    
-            except ImportError:
-                # If the module is not installed, show a warning and display a table instead
-                st.warning("streamlit-timeline module not found. Install it with 'pip install streamlit-timeline' for interactive timeline visualization.")
-                
-                # Create a simple table view
-                st.markdown("### Condition Events (Table View)")
-                st.dataframe(filtered_timeline[['date', 'condition', 'event_type', 'severity', 'description']])
-                
-        except Exception as e:
-            st.error(f"Error loading timeline visualization: {e}")
+            from streamlit_timeline import timeline as st_timeline
             
-            # Fallback to table view
-            st.markdown("### Condition Events (Table View)")
+            # Items and groups of the selected conditions come straight from the model
+            st_timeline(timeline.timeline_data(selected_conditions), height="400px")
             
-            # Sort by date
-            filtered_timeline = filtered_timeline.sort_values('date')
+        except ImportError:
+            # If the module is not installed, show a warning and display a table instead
+            st.warning("streamlit-timeline module not found. Install it with 'pip install streamlit-timeline' for interactive timeline visualization.")
             
-            # Display as table
-            st.dataframe(filtered_timeline[['date', 'condition', 'event_type', 'severity', 'description']])
+            # Create a simple table view (oldest first)
+            st.markdown("### Condition Events (Table View)")
+            st.dataframe(timeline.table(selected_conditions)[['date', 'condition', 'event_type', 'severity', 'description']])
         
         # Display events in detail
         st.markdown("### Condition Events")
         
-        # Group by condition
+        # Events are already grouped by condition, oldest first
         for condition in selected_conditions:
-            condition_events = filtered_timeline[filtered_timeline['condition'] == condition]
+            condition_events = timeline.condition_events(condition)
             
-            if not condition_events.empty:
+            if condition_events:
                 with st.expander(f"{condition} - {len(condition_events)} events"):
-                    # Sort by date, oldest first
-                    condition_events = condition_events.sort_values('date')
-                    
-                    for _, event in condition_events.iterrows():
-                        # Determine severity class for color
-                        severity_class = "normal-value"
-                        if event['severity'] == 'Moderate':
-                            severity_class = "warning-value"
-                        elif event['severity'] == 'Severe':
-                            severity_class = "danger-value"
-                        
-                        # Display event in styled div
-                        st.markdown(f"""
-                        <div class="timeline-item">
-                            <strong>{event['date']}</strong> - <strong>{event['event_type']}</strong>
-                            <br>
-                            <span class="{severity_class}">Severity: {event['severity']}</span>
-                            <br>
-                            {event['description']}
-                            <br>
-                            <small>Provider: {event['healthcare_provider']}</small>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    # All events of the condition in one element
+                    html_blocks.render(*[html_blocks.timeline_event(event) for event in condition_events])
 
 # Function to display medical comments
 def display_medical_comments(patient_id):
     st.markdown('<h2 class="sub-header">Medical Professional Comments</h2>', unsafe_allow_html=True)
     
-    # Check if comments exist
-    comments_file = f'data/comments_{patient_id}.csv'
-    if os.path.exists(comments_file):
-        comments_df = pd.read_csv(comments_file)
-    else:
-        comments_df = pd.DataFrame(columns=['id', 'patient_id', 'date', 'name', 'profession', 'comment', 'topic'])
-    
     # Add a new comment
     st.markdown("### Add New Comment")
     
@@ -955,25 +1047,8 @@ def display_medical_comments(patient_id):
     
     if st.button("Submit Comment"):
         if comment_text:
-            # Create new comment entry
-            new_comment = {
-                'id': f'C{len(comments_df) + 1:03d}',
-                'patient_id': patient_id,
-                'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'name': name,
-                'profession': profession,
-                'comment': comment_text,
-                'topic': topic
-            }
-            
-            # Append to existing comments
-            updated_comments = pd.concat([comments_df, pd.DataFrame([new_comment])], ignore_index=True)
-            
-            # Save to CSV
-            updated_comments.to_csv(comments_file, index=False)
-            
-            # Refresh the displayed comments
-            comments_df = updated_comments
+            # Append to the comment journal (O(1), safe against concurrent submissions)
+            comments_journal.append_comment(patient_id, name, profession, comment_text, topic)
             
             st.success("Comment submitted successfully!")
         else:
@@ -984,89 +1059,124 @@ def display_medical_comments(patient_id):
     # Display existing comments
     st.markdown("### Previous Comments")
     
-    if comments_df.empty:
+    comment_facets = facets.load_comment_facets(patient_id)
+    if comment_facets is None or not len(comment_facets):
         st.info("No comments found for this patient. Add a comment above to get started.")
     else:
         # Filter options
         col1, col2 = st.columns(2)
         
         with col1:
-            professions = sorted(comments_df['profession'].unique())
+            professions = comment_facets.options('profession')
             selected_professions = st.multiselect("Filter by Profession", professions, default=professions)
         
         with col2:
-            topics = sorted(comments_df['topic'].unique())
+            topics = comment_facets.options('topic')
             selected_topics = st.multiselect("Filter by Topic", topics, default=topics)
         
-        # Filter comments
-        filtered_comments = comments_df[
-            (comments_df['profession'].isin(selected_professions)) &
-            (comments_df['topic'].isin(selected_topics))
-        ]
+        # Filter comments, newest first
+        rows, counts = comment_facets.query({'profession': selected_professions, 'topic': selected_topics},
+                                            descending=True)
+        with col1:
+            st.caption(format_facet_counts(counts['profession']))
+        with col2:
+            st.caption(format_facet_counts(counts['topic']))
+        filtered_comments = comment_facets.rows(rows)
         
         if filtered_comments.empty:
             st.info("No comments match the selected filters.")
         else:
-            # Sort by date (newest first)
-            filtered_comments = filtered_comments.sort_values('date', ascending=False)
-            
-            for _, comment in filtered_comments.iterrows():
-                # Create comment card
-                st.markdown(f"""
-                <div class="comment-box">
-                    <strong>{comment['name']}</strong> ({comment['profession']}) - <em>{comment['date']}</em>
-                    <br>
-                    <strong>Topic:</strong> {comment['topic']}
-                    <br><br>
-                    {comment['comment']}
-                </div>
-                """, unsafe_allow_html=True)
+            # All comment cards in one element (comment text is escaped)
+            html_blocks.render(*[html_blocks.comment_card(comment) for comment in filtered_comments.to_dict('records')])
+
+# Sections of the dashboard and the display function behind each one
+# (only the profile needs the fully decoded patient record)
+SECTIONS = {
+    "📋 Patient Profile": lambda patient_id: display_patient_profile(patient_index.load_patient_index().get(patient_id)),
+    "📊 Live Monitoring": lambda patient_id: display_live_monitoring(patient_id),
+    "📑 Medical Reports": lambda patient_id: display_medical_reports(patient_id),
+    "📈 Condition Timeline": lambda patient_id: display_condition_timeline(patient_id),
+    "💬 Medical Comments": lambda patient_id: display_medical_comments(patient_id),
+}
+
+# Function to render a single dashboard section for the selected patient
+def render_section(section, patient_id):
+    SECTIONS[section](patient_id)
 
 # Main application function
 def main():
     # Ensure data exists
-    patients_df = ensure_data_exists()
+    ensure_data_exists()
+    
+    # Pre-parsed patient directory (rebuilt only when patients.csv changes)
+    patients = patient_index.load_patient_index()
     
     st.markdown('<h1 class="main-header">🏥 Patient Health Dashboard</h1>', unsafe_allow_html=True)
     
     # Sidebar for patient selection
     st.sidebar.title("Patient Selection")
     
-    # Convert patients DataFrame to a list of dictionaries
-    patients_list = patients_df.to_dict('records')
-    
-    # Process each patient to ensure nested structures are parsed
-    processed_patients = []
-    for patient in patients_list:
-        processed_patients.append(process_patient_data(patient))
-    
-    # Create a dropdown to select patient
-    patient_names = [f"{p['id']} - {p['full_name']}" for p in processed_patients]
-    selected_patient_name = st.sidebar.selectbox("Select Patient", patient_names)
-    
-    # Get the selected patient ID
-    selected_patient_id = selected_patient_name.split(' - ')[0]
-    
-    # Get the selected patient data
-    selected_patient = next((p for p in processed_patients if p['id'] == selected_patient_id), None)
-    
-    # Tabs for different sections
-    tabs = st.tabs(["📋 Patient Profile", "📊 Live Monitoring", "📑 Medical Reports", "📈 Condition Timeline", "💬 Medical Comments"])
-    
-    with tabs[0]:  # Patient Profile Tab
-        display_patient_profile(selected_patient)
+    # Search the roster; only one page of matches is offered in the dropdown
+    search = patient_search.load_patient_search()
+    query = st.sidebar.text_input("Search patients", placeholder="ID, name, physician or condition")
+    matches, total = search.search(query)
+    
+    page = 0
+    pages = patient_search.page_count(total)
+    if pages > 1:
+        # Keyed by the query so a new search starts again on the first page
+        page = st.sidebar.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                                       key=f"patient_page_{query}") - 1
+        matches, total = search.search(query, page)
+    
+    if matches:
+        st.sidebar.caption(f"{total} matching patients")
+        # Options are IDs, labels are looked up in the patient index
+        selected_patient_id = st.sidebar.selectbox("Select Patient", matches, format_func=patients.label)
+        st.session_state['selected_patient_id'] = selected_patient_id
+    else:
+        st.sidebar.warning("No patients match this search")
+        selected_patient_id = st.session_state.get('selected_patient_id', patients.ids[0])
     
-    with tabs[1]:  # Live Monitoring Tab
-        display_live_monitoring(selected_patient_id)
+    # A live stream only ever follows the patient currently selected
+    live_stream.stop_unless(get_session_id(), selected_patient_id)
     
-    with tabs[2]:  # Medical Reports Tab
-        display_medical_reports(selected_patient_id)
+    # Lazy navigation renders only the selected section on each rerun;
+    # the tab layout executes all five display functions every time
+    lazy_navigation = st.sidebar.toggle("Lazy navigation", value=True,
+                                        help="Only run the selected section on each interaction")
     
-    with tabs[3]:  # Condition Timeline Tab
-        display_condition_timeline(selected_patient_id)
+    render_start = time.perf_counter()
     
-    with tabs[4]:  # Medical Comments Tab
-        display_medical_comments(selected_patient_id)
+    if lazy_navigation:
+        # The selection is kept outside the widget state so it also survives
+        # switching back and forth between the two navigation modes
+        section_names = list(SECTIONS.keys())
+        if st.session_state.get('active_section') not in SECTIONS:
+            st.session_state['active_section'] = section_names[0]
+        
+        active_section = st.radio("Section", section_names,
+                                  index=section_names.index(st.session_state['active_section']),
+                                  horizontal=True, label_visibility="collapsed")
+        st.session_state['active_section'] = active_section
+        
+        render_section(active_section, selected_patient_id)
+    else:
+        # Tabs for different sections
+        tabs = st.tabs(list(SECTIONS.keys()))
+        
+        for tab, section in zip(tabs, SECTIONS):
+            with tab:
+                render_section(section, selected_patient_id)
+    
+    render_ms = (time.perf_counter() - render_start) * 1000
+    st.sidebar.caption(f"Sections rendered in {render_ms:.0f} ms")
+    
+    # Data cache counters (repeated reruns should only register hits)
+    stats = data_store.cache_stats()
+    st.sidebar.caption(f"Data cache: {stats['hits']} hits / {stats['misses']} misses ({stats['entries']} files)")
+    figures = figure_cache.cache_stats()
+    st.sidebar.caption(f"Figure cache: {figures['hits']} hits / {figures['misses']} misses ({figures['entries']} figures)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_store
+
+
+# Empty data directory in a scratch working directory, with a cold data cache
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_store, 'BACKEND', 'csv')
+    os.makedirs(data_store.DATA_DIR)
+    data_store.clear()
+    yield tmp_path / data_store.DATA_DIR
+    data_store.clear()
@@ -0,0 +1,42 @@
+import pandas as pd
+
+import comments_journal
+import data_store
+
+PATIENT = 'P001'
+
+
+def _comments(count):
+    return pd.DataFrame({
+        'id': [f'C{i:03d}' for i in range(count, 0, -1)],
+        'patient_id': PATIENT,
+        'date': pd.date_range('2024-01-01', periods=count, freq='h')[::-1].strftime('%Y-%m-%d %H:%M:%S'),
+        'name': 'Dr. Smith',
+        'profession': 'Physician',
+        'comment': 'Stable',
+        'topic': 'General',
+    })
+
+def _append():
+    return comments_journal.append_comment(PATIENT, 'Dr. Jones', 'Nurse', 'Checked in', 'General')['id']
+
+def _ids():
+    return list(pd.read_csv(data_store.comments_path(PATIENT))['id'])
+
+
+def test_ids_continue_after_append(data_dir):
+    data_store.save_table(_comments(3), 'comments', PATIENT)
+    assert [_append(), _append()] == ['C004', 'C005']
+
+
+def test_rewritten_file_never_reuses_an_id(data_dir):
+    data_store.save_table(_comments(3), 'comments', PATIENT)
+    _append()
+
+    # The CSV is regenerated with more comments than the journal has issued
+    data_store.save_table(_comments(10), 'comments', PATIENT)
+    new_id = _append()
+
+    assert new_id == 'C011'
+    assert len(set(_ids())) == 11
+    assert comments_journal.compact(PATIENT) == 11
@@ -0,0 +1,47 @@
+import pytest
+
+import patient_index
+
+
+def _patients(n):
+    return [{
+        'id': f'P{i:03d}',
+        'full_name': f'Patient {i}',
+        'conditions': ['Asthma'],
+        'medications': [],
+        'allergies': ['Penicillin'],
+        'emergency_contact': {'name': 'Contact', 'phone': '555'},
+        'physician': {'name': 'Dr. Smith'},
+        'insurance': {'provider': 'Blue Cross'},
+    } for i in range(1, n + 1)]
+
+
+def _no_bulk_decode(*args):
+    pytest.fail("decode_column must not be used for a single record")
+
+
+def test_get_decodes_only_the_requested_patient(data_dir, monkeypatch):
+    patient_index.write_patients(_patients(5))
+    index = patient_index.load_patient_index()
+
+    decoded = []
+    decode_value = patient_index.decode_value
+    monkeypatch.setattr(patient_index, 'decode_value',
+                        lambda value, field: decoded.append(field) or decode_value(value, field))
+    monkeypatch.setattr(patient_index, 'decode_column', _no_bulk_decode)
+
+    record = index.get('P002')
+
+    assert record['conditions'] == ['Asthma']
+    assert record['physician'] == {'name': 'Dr. Smith'}
+    assert sorted(decoded) == sorted(patient_index.NESTED_FIELDS)
+    assert list(index._records) == ['P002']
+    assert isinstance(index.frame.loc[0, 'conditions'], str)
+
+
+def test_get_memoizes_and_rejects_unknown_ids(data_dir):
+    patient_index.write_patients(_patients(2))
+    index = patient_index.load_patient_index()
+
+    assert index.get('P001') is index.get('P001')
+    assert index.get('P999') is None
@@ -0,0 +1,99 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_store
+import report_search
+
+
+@pytest.fixture(autouse=True)
+def no_refresh_history(monkeypatch):
+    monkeypatch.setattr(report_search, '_refreshes', {})
+
+
+def _save_reports(patient_id, contents):
+    frame = pd.DataFrame({
+        'id': [f'R{i:03d}' for i in range(1, len(contents) + 1)],
+        'patient_id': patient_id,
+        'date': '2026-01-01',
+        'source': 'Lab',
+        'report_type': 'Blood Test',
+        'summary': '',
+        'content': contents,
+        'nlp_summary': '',
+        'specialist': 'Dr. Lee',
+    })
+    data_store.save_table(frame, 'reports', patient_id)
+
+def _populate():
+    _save_reports('P001', ['elevated glucose levels noted', 'routine follow up'])
+    _save_reports('P002', ['glucose within normal range', 'mild hypertension observed'])
+    _save_reports('P003', ['chest xray clear', 'glucose monitoring advised'])
+
+def _matches(query, patient_id=None):
+    found = report_search.load_index().search(query, patient_id)
+    return sorted(zip(found['patient_id'], found['report_id']))
+
+def _manifest():
+    return report_search._read_manifest(os.path.join(data_store.DATA_DIR, report_search.INDEX_NAME))
+
+
+def test_changed_file_goes_to_the_delta_tier(data_dir, monkeypatch):
+    monkeypatch.setattr(report_search, 'MERGE_FRACTION', 1.0)
+    _populate()
+    report_search.update_index()
+    main = _manifest()['main']
+
+    _save_reports('P002', ['tachycardia episode overnight'])
+    assert report_search.update_index() == 1
+
+    manifest = _manifest()
+    assert manifest['main'] == main
+    assert list(manifest['delta']['patients']) == ['P002']
+    assert _matches('glucose') == [('P001', 'R001'), ('P003', 'R002')]
+    assert _matches('tachycardia') == [('P002', 'R001')]
+    assert _matches('hypertension', 'P002') == []
+
+
+def test_large_delta_is_merged(data_dir):
+    _populate()
+    report_search.update_index()
+    _save_reports('P002', ['tachycardia episode overnight'])
+    report_search.update_index()
+
+    manifest = _manifest()
+    assert manifest['delta'] is None
+    assert _matches('tachycardia') == [('P002', 'R001')]
+    assert _matches('glucose') == [('P001', 'R001'), ('P003', 'R002')]
+
+
+def test_merge_matches_a_fresh_build(data_dir, monkeypatch):
+    monkeypatch.setattr(report_search, 'MERGE_FRACTION', 1.0)
+    _populate()
+    report_search.update_index()
+    _save_reports('P001', ['glucose glucose rising'])
+    os.remove(data_store.reports_path('P003'))
+    report_search.update_index()
+    tiered = report_search.load_index().search('glucose')
+
+    report_search.update_index(merge=True)
+    assert _manifest()['delta'] is None
+    merged = report_search.load_index().search('glucose')
+    pd.testing.assert_frame_equal(tiered[['patient_id', 'report_id']], merged[['patient_id', 'report_id']])
+
+
+def test_queries_do_not_scan_the_reports_files(data_dir, monkeypatch):
+    _populate()
+    report_search.search('glucose')
+
+    scans = []
+    sources = report_search._sources
+    monkeypatch.setattr(report_search, '_sources', lambda data_dir: scans.append(data_dir) or sources(data_dir))
+    for _ in range(5):
+        report_search.search('glucose')
+    for thread in [thread for _, thread in report_search._refreshes.values() if thread is not None]:
+        thread.join()
+
+    # At most one background check within REFRESH_SECONDS
+    assert len(scans) <= 1
@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+import sqlite_store
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = sqlite_store.ConnectionPool(str(tmp_path / 'dashboard.db'), size=1)
+    yield pool
+    pool.close()
+
+
+def test_failed_connect_frees_its_slot(pool, monkeypatch):
+    connect = pool._connect
+    monkeypatch.setattr(pool, '_connect', lambda: (_ for _ in ()).throw(sqlite3.OperationalError('unable to open')))
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection():
+            pass
+
+    monkeypatch.setattr(pool, '_connect', connect)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_failed_commit_is_rolled_back(pool, monkeypatch):
+    monkeypatch.setattr(sqlite_store, 'get_pool', lambda path=None: pool)
+    with pool.connection() as conn:
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE child (parent_id INTEGER REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED)")
+
+    # The deferred foreign key is only checked, and fails, at COMMIT
+    with pytest.raises(sqlite3.IntegrityError):
+        with sqlite_store.transaction() as conn:
+            conn.execute("INSERT INTO child VALUES (1)")
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM child").fetchone() == (0,)
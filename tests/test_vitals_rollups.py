@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+import vitals_rollups
+
+PATIENT = 'P001'
+
+
+@pytest.fixture(autouse=True)
+def fresh_rollups(monkeypatch):
+    monkeypatch.setattr(vitals_rollups, '_rollups', {})
+
+
+def _readings(start, periods, heart_rate=None, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({'timestamp': pd.date_range(start, periods=periods, freq='15min')
+                          .strftime('%Y-%m-%d %H:%M:%S')})
+    for vital in vitals_rollups.VITALS:
+        frame[vital] = rng.integers(60, 90, periods).astype(float)
+    if heart_rate is not None:
+        frame['heart_rate'] = float(heart_rate)
+    return frame
+
+def _save(frame):
+    data_store.write_csv(frame, data_store.vitals_path(PATIENT))
+
+# Rollups computed from scratch for the current file
+def _rebuilt(resolution):
+    return vitals_rollups.compute_buckets(vitals_rollups.vitals_store.load_vitals(PATIENT).frame,
+                                          vitals_rollups.RESOLUTIONS[resolution])
+
+def _assert_current(rollups):
+    for resolution in vitals_rollups.RESOLUTIONS:
+        pd.testing.assert_frame_equal(rollups.frames[resolution].reset_index(drop=True),
+                                      _rebuilt(resolution), check_dtype=False)
+
+
+def test_append_updates_only_new_buckets(data_dir, monkeypatch):
+    history = _readings('2026-01-01', 300)
+    _save(history.iloc[:200])
+    rollups = vitals_rollups.load_rollups(PATIENT)
+
+    calls = []
+    compute = vitals_rollups.compute_buckets
+    monkeypatch.setattr(vitals_rollups, 'compute_buckets',
+                        lambda frame, freq: calls.append(len(frame)) or compute(frame, freq))
+    _save(history)
+    rollups = vitals_rollups.load_rollups(PATIENT)
+
+    assert calls and max(calls) < len(history)
+    monkeypatch.setattr(vitals_rollups, 'compute_buckets', compute)
+    _assert_current(rollups)
+
+
+def test_same_length_rewrite_rebuilds(data_dir):
+    _save(_readings('2026-01-01', 200))
+    rollups = vitals_rollups.load_rollups(PATIENT)
+    assert rollups.frames['daily']['heart_rate'].max() < 90
+
+    # Same timestamps and row count, different values
+    _save(_readings('2026-01-01', 200, heart_rate=200))
+    rollups = vitals_rollups.load_rollups(PATIENT)
+
+    assert (rollups.frames['daily']['heart_rate'] == 200).all()
+    _assert_current(rollups)
+
+
+def test_edited_prefix_with_appended_rows_rebuilds(data_dir):
+    history = _readings('2026-01-01', 300)
+    _save(history.iloc[:200])
+    vitals_rollups.load_rollups(PATIENT)
+
+    edited = history.copy()
+    edited.loc[0, 'heart_rate'] = 250.0
+    _save(edited)
+    rollups = vitals_rollups.load_rollups(PATIENT)
+
+    assert rollups.frames['daily']['heart_rate_max'].iloc[0] == 250
+    _assert_current(rollups)
+
+
+def test_edited_tail_with_appended_rows_rebuilds(data_dir):
+    history = _readings('2026-01-01', 300)
+    _save(history.iloc[:200])
+    vitals_rollups.load_rollups(PATIENT)
+
+    edited = history.copy()
+    edited.loc[199, 'heart_rate'] = 250.0
+    _save(edited)
+    rollups = vitals_rollups.load_rollups(PATIENT)
+
+    assert rollups.frames['hourly']['heart_rate_max'].max() == 250
+    _assert_current(rollups)
+
+
+def test_append_check_only_reads_the_ends(data_dir):
+    history = _readings('2026-01-01', 2000)
+    edited = history.copy()
+    edited.loc[1000, 'heart_rate'] = 250.0
+
+    # Rows between the first one and the tail are never hashed
+    series, other = vitals_rollups.vitals_store.VitalsSeries(history), vitals_rollups.vitals_store.VitalsSeries(edited)
+    assert vitals_rollups.fingerprint(series, 2000) == vitals_rollups.fingerprint(other, 2000)
+    assert vitals_rollups.fingerprint(series, 1001) != vitals_rollups.fingerprint(other, 1001)
+
+
+def test_long_windows_use_rollups():
+    hours, day, month, year = (pd.Timedelta(hours=6), pd.Timedelta(days=1), pd.Timedelta(days=30),
+                               pd.Timedelta(days=365))
+
+    assert vitals_rollups.choose_resolution(day, 1000, 1400) == 'raw'
+    assert vitals_rollups.choose_resolution(hours, 2000, 1400) == 'raw'
+    assert vitals_rollups.choose_resolution(day, 1440, 1400) == 'hourly'
+    assert vitals_rollups.choose_resolution(month, 43200, 1400) == 'hourly'
+    assert vitals_rollups.choose_resolution(month, 43200, 100) == 'daily'
+    assert vitals_rollups.choose_resolution(year, 525600, 1400) == 'daily'
+    assert vitals_rollups.choose_resolution(year, 525600, 100) == 'daily'
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+import vitals_sim
+
+PATIENT = 'P001'
+
+
+@pytest.fixture(autouse=True)
+def fresh_simulators(monkeypatch):
+    monkeypatch.setattr(vitals_sim, '_simulators', {})
+
+
+def _save_history(heart_rate, periods):
+    frame = pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=periods, freq='15min')
+                          .strftime('%Y-%m-%d %H:%M:%S')})
+    for vital, value in zip(vitals_sim.VITALS, vitals_sim.DEFAULT_BASELINE):
+        frame[vital] = value
+    frame['heart_rate'] = heart_rate
+    data_store.save_table(frame, 'vitals', PATIENT)
+
+
+def test_simulator_is_kept_while_history_is_unchanged(data_dir):
+    _save_history(70, 20)
+    simulator = vitals_sim.get_simulator(PATIENT)
+    simulator.tick()
+    assert vitals_sim.get_simulator(PATIENT) is simulator
+
+
+def test_rewritten_history_reseeds_the_simulator(data_dir):
+    _save_history(70, 20)
+    simulator = vitals_sim.get_simulator(PATIENT)
+
+    _save_history(110, 30)
+    reseeded = vitals_sim.get_simulator(PATIENT)
+
+    assert reseeded is not simulator
+    assert reseeded.baseline[vitals_sim.VITALS.index('heart_rate')] == 110
+    assert np.allclose(reseeded.state, reseeded.baseline)
@@ -0,0 +1,133 @@
+import os
+import glob
+
+import numpy as np
+import pandas as pd
+
+# Declarative vital sign alert rules and a vectorized classification engine.
+#
+# Each vital has a normal range and a wider warning range: readings inside the
+# normal range are NORMAL, readings outside it but inside the warning range are
+# WARNING, and anything beyond the warning range is DANGER (bounds inclusive).
+# The KPI cards, the chart shading and batch scans all classify through this
+# table, and whole arrays of readings are classified in a single pass.
+
+NORMAL, WARNING, DANGER = 0, 1, 2
+
+LEVEL_NAMES = ['normal', 'warning', 'danger']
+
+# CSS classes used by the dashboard for each level
+CSS_CLASSES = ['normal-value', 'warning-value', 'danger-value']
+
+THRESHOLDS = pd.DataFrame([
+    # vital,                     normal low, normal high, warning low, warning high
+    ('heart_rate',               60,    100,    50,    120),
+    ('blood_pressure_systolic',  90,    130,    80,    180),
+    ('blood_pressure_diastolic', 60,    80,     50,    120),
+    ('oxygen_saturation',        95,    np.inf, 90,    np.inf),
+    ('temperature',              36.0,  37.5,   35.5,  38.0),
+    ('respiratory_rate',         12,    20,     10,    30),
+    ('glucose',                  70,    140,    55,    200),
+], columns=['vital', 'normal_low', 'normal_high', 'warning_low', 'warning_high']).set_index('vital')
+
+VITALS = list(THRESHOLDS.index)
+
+
+# Alert level (int8 array) for every value of one vital
+def classify(vital, values):
+    rule = THRESHOLDS.loc[vital]
+    values = np.asarray(values, dtype=float)
+    outside_normal = (values < rule['normal_low']) | (values > rule['normal_high'])
+    outside_warning = (values < rule['warning_low']) | (values > rule['warning_high'])
+    return outside_normal.astype(np.int8) + outside_warning.astype(np.int8)
+
+# Alert levels for every vital present in a frame of readings
+def classify_frame(frame):
+    return pd.DataFrame({vital: classify(vital, frame[vital].to_numpy())
+                         for vital in VITALS if vital in frame.columns}, index=frame.index)
+
+# Worst level across the given vitals of a single reading
+def level(reading, *vitals):
+    return max(int(classify(vital, [reading[vital]])[0]) for vital in vitals)
+
+# CSS class for the worst level across the given vitals of a single reading
+def css_class(reading, *vitals):
+    return CSS_CLASSES[level(reading, *vitals)]
+
+# Contiguous runs of readings at or above min_level for one vital.
+# `times` must be sorted; each episode spans its first to its last reading.
+def episodes(times, values, vital, min_level=WARNING):
+    times = np.asarray(times, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=float)
+    levels = classify(vital, values)
+    flagged = levels >= min_level
+
+    edges = np.diff(np.concatenate(([0], flagged.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    lengths = ends - starts + 1
+
+    if len(starts):
+        # Flagged readings of each episode are contiguous once the rest are
+        # dropped, so per-episode reductions are single reduceat calls
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        flagged_values = values[flagged]
+        peak = np.maximum.reduceat(levels[flagged], offsets)
+        low = np.minimum.reduceat(flagged_values, offsets)
+        high = np.maximum.reduceat(flagged_values, offsets)
+    else:
+        peak, low, high = np.empty(0, dtype=np.int8), np.empty(0), np.empty(0)
+
+    return pd.DataFrame({
+        'vital': np.full(len(starts), vital, dtype=object),
+        'start': times[starts],
+        'end': times[ends],
+        'duration': times[ends] - times[starts],
+        'readings': lengths,
+        'peak_level': peak,
+        'min': low,
+        'max': high,
+    })
+
+# Episodes for every vital in a frame of readings (with a 'datetime' column)
+def frame_episodes(frame, min_level=WARNING):
+    times = frame['datetime'].to_numpy()
+    parts = [episodes(times, frame[vital].to_numpy(), vital, min_level) for vital in VITALS if vital in frame.columns]
+    return pd.concat(parts, ignore_index=True) if parts else episodes([], [], VITALS[0])
+
+# Number of warning and danger readings per vital in each time bucket (e.g. 'h', 'D')
+def window_counts(frame, freq='D'):
+    buckets = frame['datetime'].dt.floor(freq)
+    codes, unique_buckets = pd.factorize(buckets, sort=True)
+    columns = {}
+    for vital in VITALS:
+        if vital not in frame.columns:
+            continue
+        levels = classify(vital, frame[vital].to_numpy())
+        for lvl in (WARNING, DANGER):
+            columns[f'{vital}_{LEVEL_NAMES[lvl]}'] = np.bincount(codes[levels == lvl], minlength=len(unique_buckets))
+    return pd.DataFrame(columns, index=pd.Index(unique_buckets, name='datetime'))
+
+# Totals of warning and danger readings per vital for a whole history
+def summarize(frame):
+    summary = {}
+    for vital in VITALS:
+        if vital in frame.columns:
+            counts = np.bincount(classify(vital, frame[vital].to_numpy()), minlength=3)
+            summary[vital] = dict(zip(LEVEL_NAMES, counts.tolist()))
+    return summary
+
+
+# Batch scan: warning/danger totals for every patient's vitals file in data_dir
+def scan_directory(data_dir='data'):
+    rows = []
+    for path in sorted(glob.glob(os.path.join(data_dir, 'vitals_*.csv'))):
+        patient_id = os.path.basename(path)[len('vitals_'):-len('.csv')]
+        frame = pd.read_csv(path, usecols=lambda c: c in VITALS)
+        for vital, counts in summarize(frame).items():
+            rows.append({'patient_id': patient_id, 'vital': vital, **counts})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print(scan_directory().to_string(index=False))
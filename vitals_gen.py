@@ -0,0 +1,302 @@
+import io
+import os
+import zlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_store
+
+# Vectorized vital sign history generator shared by data_gen.py and st_app.py.
+#
+# The whole reading matrix for a horizon is produced with a handful of NumPy
+# calls (one draw per vital for all rows) and written with a single to_csv, so
+# a year of minute-level readings for a patient takes well under a second.
+
+# Column order of the vitals CSV files
+COLUMNS = ['patient_id', 'timestamp', 'heart_rate', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+           'temperature', 'respiratory_rate', 'oxygen_saturation', 'glucose']
+
+# Clinical schedule used when no sampling interval is given
+DAILY_READING_HOURS = [8, 12, 16, 20]
+
+# Per vital: baseline range, +/- variation per reading and clamp bounds
+# (integer vitals use inclusive integer ranges, like random.randint)
+VITAL_SPECS = {
+    'heart_rate':               {'base': (65, 85),     'spread': 10,  'bounds': (40, 120)},
+    'blood_pressure_systolic':  {'base': (110, 140),   'spread': 15,  'bounds': (90, 180)},
+    'blood_pressure_diastolic': {'base': (70, 90),     'spread': 10,  'bounds': (50, 110)},
+    'temperature':              {'base': (36.5, 37.3), 'spread': 0.4, 'bounds': (35.5, 38.0)},
+    'respiratory_rate':         {'base': (12, 18),     'spread': 3,   'bounds': (10, 25)},
+    'oxygen_saturation':        {'base': (94, 99),     'spread': 3,   'bounds': (88, 100)},
+    'glucose':                  {'base': (80, 120),    'spread': 20,  'bounds': (60, 200)},
+}
+
+# Patterns applied after clamping
+WEEKEND_HEART_RATE_BOOST = (0, 5)     # more activity on weekends
+AFTER_LUNCH_HOURS = (12, 14)
+AFTER_LUNCH_GLUCOSE_BOOST = (10, 30)
+
+
+# Random generator for a patient; the same (seed, patient_id) always gives the
+# same stream while different patients get independent streams
+def patient_rng(patient_id, seed=None):
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng([seed, zlib.crc32(str(patient_id).encode())])
+
+# Readings taken on the given days (datetime64[D]) following DAILY_READING_HOURS
+# at a random minute, offset by `seconds` like the original day-by-day loop
+def daily_timestamps(day_starts, seconds, rng):
+    hours = np.array(DAILY_READING_HOURS, dtype='timedelta64[h]')
+    minutes = rng.integers(0, 60, size=(len(day_starts), len(hours))).astype('timedelta64[m]')
+    return (day_starts[:, None] + hours[None, :] + minutes + seconds).ravel().astype('datetime64[s]')
+
+# Reading timestamps (datetime64[s]) for a horizon ending at `end`.
+# Without an interval, readings follow DAILY_READING_HOURS at a random minute.
+def reading_timestamps(days, interval_minutes=None, end=None, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    end = np.datetime64(end if end is not None else datetime.now(), 's')
+    start = end - np.timedelta64(int(days * 86400), 's')
+
+    if interval_minutes:
+        step = np.timedelta64(int(interval_minutes * 60), 's')
+        count = int((end - start) // step) + 1
+        return start + np.arange(count) * step
+
+    # One row per day from start to end inclusive, keeping the start's seconds
+    day_starts = start.astype('datetime64[D]') + np.arange(int((end - start) // np.timedelta64(1, 'D')) + 1)
+    seconds = (start - start.astype('datetime64[m]')).astype('timedelta64[s]')
+    return daily_timestamps(day_starts, seconds, rng)
+
+# Per-patient baseline for every vital
+def draw_baselines(rng):
+    baselines = {}
+    for vital, spec in VITAL_SPECS.items():
+        low, high = spec['base']
+        if vital == 'temperature':
+            baselines[vital] = round(rng.uniform(low, high), 1)
+        else:
+            baselines[vital] = int(rng.integers(low, high + 1))
+    return baselines
+
+# Readings for the given timestamps around fixed baselines
+def vitals_for_timestamps(patient_id, timestamps, baselines, rng):
+    n = len(timestamps)
+
+    columns = {'patient_id': np.full(n, patient_id, dtype=object), 'timestamp': timestamps}
+    for vital, spec in VITAL_SPECS.items():
+        lower, upper = spec['bounds']
+        spread = spec['spread']
+        if vital == 'temperature':
+            values = np.round(np.clip(baselines[vital] + rng.uniform(-spread, spread, n), lower, upper), 1)
+        else:
+            values = np.clip(baselines[vital] + rng.integers(-spread, spread + 1, n), lower, upper)
+        columns[vital] = values
+
+    # Weekend activity (1970-01-01 was a Thursday, so weekday = (days + 3) % 7)
+    weekday = (timestamps.astype('datetime64[D]').astype(np.int64) + 3) % 7
+    weekend = weekday >= 5
+    low, high = WEEKEND_HEART_RATE_BOOST
+    columns['heart_rate'] = columns['heart_rate'] + np.where(weekend, rng.integers(low, high + 1, n), 0)
+
+    # Post-meal glucose rise
+    hour = (timestamps - timestamps.astype('datetime64[D]')).astype('timedelta64[h]').astype(np.int64)
+    after_lunch = (hour >= AFTER_LUNCH_HOURS[0]) & (hour <= AFTER_LUNCH_HOURS[1])
+    low, high = AFTER_LUNCH_GLUCOSE_BOOST
+    columns['glucose'] = columns['glucose'] + np.where(after_lunch, rng.integers(low, high + 1, n), 0)
+
+    return pd.DataFrame(columns, columns=COLUMNS)
+
+# Full reading matrix for a patient as a DataFrame (timestamp as datetime64)
+def generate_vitals_frame(patient_id, days=30, interval_minutes=None, seed=None, rng=None, end=None):
+    if rng is None:
+        rng = patient_rng(patient_id, seed)
+
+    baselines = draw_baselines(rng)
+    timestamps = reading_timestamps(days, interval_minutes, end, rng)
+    return vitals_for_timestamps(patient_id, timestamps, baselines, rng)
+
+# Lookup tables for the bulk CSV writer (built on first use)
+_format_tables = {}
+
+def _table(name):
+    if name not in _format_tables:
+        if name == 'int':
+            _format_tables[name] = np.array([str(i) for i in range(1000)], dtype=object)
+        elif name == 'tenths':
+            _format_tables[name] = np.array([f'{i / 10:.1f}' for i in range(1000)], dtype=object)
+        else:
+            _format_tables[name] = np.array([f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}'
+                                             for s in range(86400)], dtype=object)
+    return _format_tables[name]
+
+# Values of one column as strings; vitals are small non-negative numbers, so the
+# common case is a single table lookup instead of per-value formatting
+def _format_column(values, decimals):
+    values = np.asarray(values)
+    scaled = np.rint(values * 10).astype(np.int64) if decimals else values.astype(np.int64)
+    table = _table('tenths' if decimals else 'int')
+    if len(scaled) and (scaled.min() < 0 or scaled.max() >= len(table)):
+        return [f'{v:.1f}' if decimals else str(int(v)) for v in values]
+    return table[scaled].tolist()
+
+# 'YYYY-MM-DD HH:MM:SS' strings for datetime64 values
+def _format_timestamps(timestamps):
+    timestamps = np.asarray(timestamps).astype('datetime64[s]')
+    days = timestamps.astype('datetime64[D]')
+    unique_days, day_index = np.unique(days, return_inverse=True)
+    day_prefix = np.array([f'{day} ' for day in unique_days], dtype=object)
+    seconds = (timestamps - days).astype(np.int64)
+    return (day_prefix[day_index] + _table('time')[seconds]).tolist()
+
+# Write a vitals frame as CSV in one bulk operation (same text as DataFrame.to_csv).
+# `target` is a path or an already open text file.
+def write_vitals_csv(frame, target, mode='w', header=True):
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, mode, newline='') as f:
+            write_vitals_csv(frame, f, header=header)
+        return
+
+    columns = [frame['patient_id'].astype(str).tolist(), _format_timestamps(frame['timestamp'])]
+    for vital in COLUMNS[2:]:
+        columns.append(_format_column(frame[vital].to_numpy(), vital == 'temperature'))
+
+    if header:
+        target.write(','.join(COLUMNS) + '\n')
+    if len(frame):
+        target.write('\n'.join(map(','.join, zip(*columns))))
+        target.write('\n')
+
+# Generate vital signs data for a specific patient and save it in one bulk write
+def generate_vital_signs(patient_id, days=30, interval_minutes=None, seed=None, rng=None, output_path=None):
+    frame = generate_vitals_frame(patient_id, days, interval_minutes, seed, rng)
+
+    if output_path is None and data_store.BACKEND == 'sqlite':
+        data_store.save_table(frame, 'vitals', patient_id)
+        return frame
+
+    path = output_path or data_store.vitals_path(patient_id)
+    write_vitals_csv(frame, path)
+    data_store.invalidate(path)
+    return frame
+
+# Rows generated and written per chunk in streaming mode
+CHUNK_ROWS = 50000
+
+# Last rows of a vitals CSV, read from the end of the file without loading it
+def read_vitals_tail(path, max_bytes=64 * 1024):
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        offset = max(len(header), size - max_bytes)
+        f.seek(offset)
+        data = f.read()
+    if offset > len(header):
+        # Drop the partial line at the start of the window
+        data = data.split(b'\n', 1)[-1]
+    return pd.read_csv(io.BytesIO(header + data))
+
+# Baselines that continue an existing history (mean of its last readings)
+def baselines_from_history(history):
+    baselines = {}
+    for vital in VITAL_SPECS:
+        mean = float(history[vital].mean())
+        baselines[vital] = round(mean, 1) if vital == 'temperature' else int(round(mean))
+    return baselines
+
+# Chunks of timestamps covering (start, end]; each chunk holds about chunk_rows readings
+def _timestamp_chunks(start, end, interval_minutes, chunk_rows, rng, after=None):
+    if interval_minutes:
+        step = np.timedelta64(int(interval_minutes * 60), 's')
+        first = start if after is None else after + step
+        total = int((end - first) // step) + 1 if end >= first else 0
+        for offset in range(0, total, chunk_rows):
+            yield first + (offset + np.arange(min(chunk_rows, total - offset))) * step
+        return
+
+    first_day = start.astype('datetime64[D]') if after is None else after.astype('datetime64[D]')
+    total_days = int((end.astype('datetime64[D]') - first_day) // np.timedelta64(1, 'D')) + 1
+    seconds = (start - start.astype('datetime64[m]')).astype('timedelta64[s]')
+    chunk_days = max(1, chunk_rows // len(DAILY_READING_HOURS))
+    for offset in range(0, total_days, chunk_days):
+        day_starts = first_day + np.arange(offset, min(total_days, offset + chunk_days))
+        timestamps = daily_timestamps(day_starts, seconds, rng)
+        if after is not None:
+            timestamps = timestamps[timestamps > after]
+        if len(timestamps):
+            yield timestamps
+
+# Streaming generation: readings are produced and written in fixed-size chunks,
+# so memory stays bounded however long the horizon is. With resume=True and an
+# existing file, generation continues after its last timestamp (up to `end`)
+# using baselines taken from its most recent readings.
+# Returns the number of rows written.
+def stream_vital_signs(patient_id, days=30, interval_minutes=None, seed=None, rng=None,
+                       output_path=None, resume=False, chunk_rows=CHUNK_ROWS, end=None):
+    if rng is None:
+        rng = patient_rng(patient_id, seed)
+    path = output_path or data_store.vitals_path(patient_id)
+    # Chunks go to the database instead when the SQLite backend is configured
+    sqlite = output_path is None and data_store.BACKEND == 'sqlite'
+    if sqlite:
+        import sqlite_store
+
+    end = np.datetime64(end if end is not None else datetime.now(), 's')
+    start = end - np.timedelta64(int(days * 86400), 's')
+    baselines = None
+    after = None
+
+    if resume and sqlite:
+        tail = sqlite_store.read_tail('vitals', patient_id)
+    elif resume and os.path.exists(path) and os.path.getsize(path) > 0:
+        tail = read_vitals_tail(path)
+    else:
+        tail = None
+    if tail is not None and not tail.empty:
+        after = np.datetime64(pd.Timestamp(tail['timestamp'].iloc[-1]).to_datetime64(), 's')
+        baselines = baselines_from_history(tail)
+
+    if baselines is None:
+        baselines = draw_baselines(rng)
+
+    written = 0
+    if sqlite:
+        if after is None:
+            sqlite_store.write_table('vitals', pd.DataFrame(columns=COLUMNS), patient_id)
+        for timestamps in _timestamp_chunks(start, end, interval_minutes, chunk_rows, rng, after):
+            chunk = vitals_for_timestamps(patient_id, timestamps, baselines, rng)
+            sqlite_store.append_rows('vitals', chunk, patient_id)
+            written += len(chunk)
+        return written
+
+    with open(path, 'a' if after is not None else 'w', newline='') as f:
+        if after is None:
+            f.write(','.join(COLUMNS) + '\n')
+        for timestamps in _timestamp_chunks(start, end, interval_minutes, chunk_rows, rng, after):
+            chunk = vitals_for_timestamps(patient_id, timestamps, baselines, rng)
+            write_vitals_csv(chunk, f, header=False)
+            written += len(chunk)
+
+    data_store.invalidate(path)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate (or extend) a patient's vital signs history")
+    parser.add_argument("patient_id")
+    parser.add_argument("--days", type=float, default=30, help="history length in days")
+    parser.add_argument("--interval-minutes", type=float, default=None,
+                        help="sampling interval (default: 4 readings per day)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--resume", action="store_true", help="append after the last timestamp in the existing file")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    rows = stream_vital_signs(args.patient_id, args.days, args.interval_minutes, args.seed,
+                              resume=args.resume, chunk_rows=args.chunk_rows)
+    print(f"Wrote {rows} readings to {data_store.vitals_path(args.patient_id)}")
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+import vitals_store
+
+# Materialized hourly and daily rollups of each patient's vitals.
+#
+# For every bucket and vital the rollup holds count, mean, min, max, p5 and p95
+# (the mean is stored under the vital's own name so charts can plot a rollup
+# exactly like raw readings). Rollups are built once per patient and then kept
+# up to date incrementally: when new readings are appended to the history only
+# the buckets from the first new reading onwards are recomputed. An append is
+# recognised by the number of rows already rolled up and a fingerprint of the
+# first and last of them, so checking costs the same however long the history
+# is; a history that is shorter or differs there (a regenerated or rewritten
+# file) is rebuilt from scratch.
+
+VITALS = ['heart_rate', 'blood_pressure_systolic', 'blood_pressure_diastolic', 'temperature',
+          'respiratory_rate', 'oxygen_saturation', 'glucose']
+
+# Rollup resolutions, finest first, with their bucket sizes
+RESOLUTIONS = {
+    'hourly': 'h',
+    'daily': 'D',
+}
+
+# A rollup is only used for a window it divides into at least this many buckets
+MIN_BUCKETS = 24
+
+# Rolled-up readings at the end of the history compared to recognise an append
+TAIL_ROWS = 64
+
+
+# Aggregate readings (with a 'datetime' column) into buckets of the given size
+def compute_buckets(frame, freq):
+    columns = {}
+    if frame.empty:
+        columns['datetime'] = pd.Series(dtype='datetime64[ns]')
+        columns['count'] = pd.Series(dtype='int64')
+        for vital in VITALS:
+            for suffix in ['', '_min', '_max', '_p5', '_p95']:
+                columns[vital + suffix] = pd.Series(dtype=float)
+        return pd.DataFrame(columns)
+
+    grouped = frame.groupby(frame['datetime'].dt.floor(freq), sort=True)[VITALS]
+    mean, low, high = grouped.mean(), grouped.min(), grouped.max()
+    p5, p95 = grouped.quantile(0.05), grouped.quantile(0.95)
+
+    columns['datetime'] = mean.index.to_numpy()
+    columns['count'] = grouped.size().to_numpy()
+    for vital in VITALS:
+        columns[vital] = mean[vital].to_numpy()
+        columns[f'{vital}_min'] = low[vital].to_numpy()
+        columns[f'{vital}_max'] = high[vital].to_numpy()
+        columns[f'{vital}_p5'] = p5[vital].to_numpy()
+        columns[f'{vital}_p95'] = p95[vital].to_numpy()
+    return pd.DataFrame(columns)
+
+
+# Digest of the first reading and the last TAIL_ROWS of the first `rows`
+# readings of a series (timestamps and vitals)
+def fingerprint(series, rows):
+    positions = np.unique(np.r_[0, np.arange(max(0, rows - TAIL_ROWS), rows)]) if rows else np.arange(0)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(series.times[positions].tobytes())
+    columns = [vital for vital in VITALS if vital in series.frame.columns]
+    digest.update(np.ascontiguousarray(series.frame.iloc[positions][columns].to_numpy(dtype=float)).tobytes())
+    return digest.digest()
+
+
+class VitalsRollups:
+    def __init__(self):
+        self.frames = {resolution: compute_buckets(pd.DataFrame(), freq) for resolution, freq in RESOLUTIONS.items()}
+        self.series = None
+        self.rows = 0
+        self.fingerprint = None
+        self.lock = threading.Lock()
+
+    # Bring the rollups in line with `series` (a vitals_store.VitalsSeries)
+    def update(self, series):
+        with self.lock:
+            if series is self.series:
+                return
+
+            # Only a history that still holds the rows rolled up so far is an append
+            appended = (self.rows and len(series) >= self.rows
+                        and fingerprint(series, self.rows) == self.fingerprint)
+
+            if appended and len(series) > self.rows:
+                # Only buckets touched by the new readings are recomputed
+                first_new = pd.Timestamp(series.times[self.rows])
+                for resolution, freq in RESOLUTIONS.items():
+                    bucket_start = first_new.floor(freq)
+                    frame = self.frames[resolution]
+                    kept = frame[frame['datetime'] < bucket_start]
+                    i, _ = series.bounds(bucket_start)
+                    fresh = compute_buckets(series.frame.iloc[i:], freq)
+                    self.frames[resolution] = pd.concat([kept, fresh], ignore_index=True)
+            elif not appended:
+                for resolution, freq in RESOLUTIONS.items():
+                    self.frames[resolution] = compute_buckets(series.frame, freq)
+
+            self.series = series
+            self.rows = len(series)
+            self.fingerprint = fingerprint(series, self.rows)
+
+    # Buckets of a resolution whose start lies between start and end (inclusive)
+    def range(self, resolution, start=None, end=None):
+        frame = self.frames[resolution]
+        times = frame['datetime'].to_numpy(dtype='datetime64[ns]')
+        i = 0 if start is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(start).floor(RESOLUTIONS[resolution]), 'ns'), side='left'))
+        j = len(times) if end is None else int(np.searchsorted(times, np.datetime64(end, 'ns'), side='right'))
+        return frame.iloc[i:max(i, j)]
+
+
+# Resolution to draw a window with: raw readings when they fit in the point
+# budget, otherwise the finest rollup whose buckets fit it (the coarsest one if
+# none does). Windows too short for MIN_BUCKETS buckets of any rollup stay raw
+# and are downsampled instead.
+def choose_resolution(window, raw_points, max_points):
+    if raw_points <= max_points:
+        return 'raw'
+    usable = [resolution for resolution, freq in RESOLUTIONS.items()
+              if window / pd.Timedelta(1, unit=freq) >= MIN_BUCKETS]
+    if not usable:
+        return 'raw'
+    for resolution in usable:
+        if window / pd.Timedelta(1, unit=RESOLUTIONS[resolution]) <= max_points:
+            return resolution
+    return usable[-1]
+
+
+_rollups = {}
+_rollups_lock = threading.Lock()
+
+# Rollups for a patient, updated to the current vitals history (None if no history)
+def load_rollups(patient_id):
+    series = vitals_store.load_vitals(patient_id)
+    if series is None:
+        return None
+    with _rollups_lock:
+        rollups = _rollups.setdefault(patient_id, VitalsRollups())
+    rollups.update(series)
+    return rollups
@@ -0,0 +1,129 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import data_store
+
+# Stateful vital sign simulator.
+#
+# Each patient gets one simulator whose baseline comes from the tail of their
+# stored vitals history. Every tick advances a bounded, mean-reverting random
+# walk around that baseline, so consecutive live readings are continuous with
+# each other and with the patient's recorded values. A tick costs O(1); batches
+# of ticks for many patients are generated with a single array computation.
+
+# Order of the vitals in every state/baseline array
+VITALS = ['heart_rate', 'blood_pressure_systolic', 'blood_pressure_diastolic', 'temperature',
+          'respiratory_rate', 'oxygen_saturation', 'glucose']
+
+# Physiological bounds (same clamps as the historical data generator)
+LOWER = np.array([40, 90, 50, 35.5, 10, 88, 60], dtype=float)
+UPPER = np.array([120, 180, 110, 38.0, 25, 100, 200], dtype=float)
+
+# Baseline used when a patient has no stored history
+DEFAULT_BASELINE = np.array([75, 125, 80, 36.9, 15, 97, 100], dtype=float)
+
+# Per-tick noise (standard deviation) and pull back towards the baseline
+STEP_SIZE = np.array([1.5, 2.5, 1.5, 0.05, 0.5, 0.4, 3.0])
+REVERSION = 0.1
+
+# Decimal places used when reporting each vital (all integers except temperature)
+DECIMALS = [0, 0, 0, 1, 0, 0, 0]
+
+# Number of stored readings averaged into the baseline
+HISTORY_TAIL = 12
+
+
+# Advance states (M x 7) by n_ticks; returns the (n_ticks x M x 7) trajectory.
+# Noise for all ticks and patients is drawn in one call; only the walk itself is
+# sequential in time, and each step is a single vectorized update over M patients.
+def step_batch(states, baselines, n_ticks, rng):
+    states = np.array(states, dtype=float, copy=True)
+    baselines = np.asarray(baselines, dtype=float)
+    noise = rng.standard_normal((n_ticks,) + states.shape) * STEP_SIZE
+    trajectory = np.empty((n_ticks,) + states.shape)
+
+    for t in range(n_ticks):
+        states += REVERSION * (baselines - states) + noise[t]
+        np.clip(states, LOWER, UPPER, out=states)
+        trajectory[t] = states
+    return trajectory
+
+# Convert one state vector into the reading dict used throughout the app
+def format_reading(patient_id, values, timestamp=None):
+    if timestamp is None:
+        timestamp = datetime.now()
+    reading = {'patient_id': patient_id, 'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S')}
+    for vital, value, decimals in zip(VITALS, values, DECIMALS):
+        reading[vital] = round(float(value), 1) if decimals else int(round(value))
+    return reading
+
+
+class VitalsSimulator:
+    def __init__(self, patient_id, baseline=None, state=None, seed=None):
+        self.patient_id = patient_id
+        self.baseline = np.array(DEFAULT_BASELINE if baseline is None else baseline, dtype=float)
+        self.state = np.array(self.baseline if state is None else state, dtype=float)
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+
+    # Seed the baseline from the mean of the last readings and start the walk at
+    # the most recent one; patients without history use the default baseline
+    @classmethod
+    def from_history(cls, patient_id, tail=HISTORY_TAIL, seed=None):
+        if not data_store.table_exists('vitals', patient_id):
+            return cls(patient_id, seed=seed)
+
+        history = data_store.read_table('vitals', patient_id)
+        columns = [v for v in VITALS if v in history.columns]
+        if history.empty or len(columns) != len(VITALS):
+            return cls(patient_id, seed=seed)
+
+        recent = history[VITALS].tail(tail).to_numpy(dtype=float)
+        baseline = np.clip(np.nanmean(recent, axis=0), LOWER, UPPER)
+        state = np.clip(recent[-1], LOWER, UPPER)
+        return cls(patient_id, baseline=baseline, state=state, seed=seed)
+
+    # Advance one step and return the new reading
+    def tick(self, timestamp=None):
+        with self.lock:
+            self.state += REVERSION * (self.baseline - self.state) + self.rng.standard_normal(len(VITALS)) * STEP_SIZE
+            np.clip(self.state, LOWER, UPPER, out=self.state)
+            values = self.state.copy()
+        return format_reading(self.patient_id, values, timestamp)
+
+
+# Advance many simulators by n_ticks in one vectorized call.
+# Returns the (n_ticks x M x 7) trajectory and leaves each simulator at its final state.
+def tick_many(simulators, n_ticks, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    states = np.stack([sim.state for sim in simulators])
+    baselines = np.stack([sim.baseline for sim in simulators])
+    trajectory = step_batch(states, baselines, n_ticks, rng)
+    for sim, final in zip(simulators, trajectory[-1]):
+        with sim.lock:
+            sim.state[:] = final
+    return trajectory
+
+
+# Process-wide registry so a patient's walk continues across reruns and viewers.
+# Entries hold the version of the vitals table they were seeded from (the same
+# token data_store validates its cache with), so a simulator is reseeded once the
+# patient's history is rewritten or appended to.
+_simulators = {}
+_simulators_lock = threading.Lock()
+
+def get_simulator(patient_id):
+    version = data_store.table_version('vitals', patient_id)
+    with _simulators_lock:
+        entry = _simulators.get(patient_id)
+        if entry is None or entry[0] != version:
+            entry = (version, VitalsSimulator.from_history(patient_id))
+            _simulators[patient_id] = entry
+    return entry[1]
+
+def reset_simulator(patient_id):
+    with _simulators_lock:
+        _simulators.pop(patient_id, None)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+import data_store
+
+# Time-indexed access to a patient's vitals history.
+#
+# The CSV is parsed once per file version (through the data_store cache): the
+# timestamp column is converted to datetime64, rows are sorted by time and the
+# sorted times are kept as a NumPy array. Range queries then locate their bounds
+# with binary search and return a positional slice, so switching between the
+# history periods costs O(log n + k) instead of a mask over the whole history.
+
+class VitalsSeries:
+    def __init__(self, frame):
+        frame = frame.copy()
+        frame['datetime'] = pd.to_datetime(frame['timestamp'], format='ISO8601')
+        if not frame['datetime'].is_monotonic_increasing:
+            frame = frame.sort_values('datetime', kind='stable')
+        self.frame = frame.reset_index(drop=True)
+        self.times = self.frame['datetime'].to_numpy(dtype='datetime64[ns]')
+
+    def __len__(self):
+        return len(self.times)
+
+    # Positions [i, j) of the readings with start <= time <= end
+    def bounds(self, start=None, end=None):
+        i = 0 if start is None else int(np.searchsorted(self.times, np.datetime64(start, 'ns'), side='left'))
+        j = len(self.times) if end is None else int(np.searchsorted(self.times, np.datetime64(end, 'ns'), side='right'))
+        return i, max(i, j)
+
+    # Readings between start and end (inclusive); either bound may be None
+    def range(self, start=None, end=None):
+        i, j = self.bounds(start, end)
+        return self.frame.iloc[i:j]
+
+    # Readings in the trailing window `duration` (a timedelta) before `now`
+    def last(self, duration, now=None):
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        return self.range(start=now - duration)
+
+    # Most recent reading as a dict, or None for an empty history
+    def latest(self):
+        if not len(self.times):
+            return None
+        return self.frame.iloc[-1].to_dict()
+
+    # First and last timestamps, or (None, None) for an empty history
+    def span(self):
+        if not len(self.times):
+            return None, None
+        return self.times[0], self.times[-1]
+
+
+# Cached, time-indexed vitals for a patient (None if there is no history)
+def load_vitals(patient_id):
+    if not data_store.table_exists('vitals', patient_id):
+        return None
+    return data_store.load_table('vitals', patient_id, VitalsSeries, kind='vitals_series')